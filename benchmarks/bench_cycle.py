@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark for multi-monitor-wallpaper.py.
+
+Builds a synthetic Variety ``Downloaded`` tree in a scratch HOME, puts fake
+``xrandr``, ``gsettings``, ``dconf`` and ``variety`` binaries on PATH, seeds
+the RNG and runs N cycles of ``MultiMonitorWallpaper.cycle_wallpapers``.
+Reports p50/p95/max per stage (the script's own timing spans) plus the number of subprocesses spawned, and
+can compare the results against a stored baseline.
+
+Example:
+    python3 benchmarks/bench_cycle.py --cycles 20 --save-baseline benchmarks/baseline.json
+    python3 benchmarks/bench_cycle.py --cycles 20 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'multi-monitor-wallpaper.py'
+
+DEFAULT_SOURCES = 'nasa_apod=40,Unsplash=15,Bing=10,wallhaven_nature=15,reddit_r_EarthPorn=5'
+
+# From thumbnails (rejected by validation) up to 8K NASA APOD originals
+IMAGE_SIZES = [(320, 240), (1280, 800), (1920, 1080), (2560, 1440), (3840, 2160), (6000, 4000), (7680, 4320)]
+
+FAKE_BINARIES = {
+    'xrandr': '''#!/bin/sh
+echo "Screen 0: minimum 8 x 8, current 5760 x 1080, maximum 32767 x 32767"
+echo "DP-1 connected 1920x1080+0+0 (normal left inverted right x axis y axis) 527mm x 296mm"
+echo "DP-2 connected primary 1920x1080+1920+0 (normal left inverted right x axis y axis) 527mm x 296mm"
+echo "HDMI-1 connected 1920x1080+3840+0 (normal left inverted right x axis y axis) 527mm x 296mm"
+echo "DP-3 disconnected (normal left inverted right x axis y axis)"
+''',
+    'gsettings': '#!/bin/sh\necho "gsettings $*" >> "$HOME/fake-bin.log"\n',
+    'dconf': '#!/bin/sh\necho "dconf $*" >> "$HOME/fake-bin.log"\ncat > /dev/null\n',
+    'variety': '#!/bin/sh\necho "variety $*" >> "$HOME/fake-bin.log"\n',
+}
+
+
+def write_png(path, width, height, rng):
+    """Write a horizontal-gradient RGB PNG without needing Pillow"""
+    base = [rng.randrange(256) for _ in range(3)]
+    row = bytearray([0])
+    for x in range(width):
+        shade = x * 255 // max(1, width - 1)
+        row += bytes(((base[0] + shade) % 256, base[1], (base[2] + 255 - shade) % 256))
+    raw = bytes(row) * height
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 1)))
+        f.write(chunk(b'IEND', b''))
+
+
+def generate_collection(root, sources, rng):
+    """Create count images per source folder, JPEG via Pillow when available, else PNG.
+
+    Files are back-dated an hour so the collection watcher treats them as
+    finished downloads rather than files still being written.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    total = 0
+    for source, count in sources.items():
+        folder = root / source
+        folder.mkdir(parents=True, exist_ok=True)
+        for index in range(count):
+            width, height = rng.choice(IMAGE_SIZES)
+            if Image is not None:
+                path = folder / f'{source}_{index:04d}.jpg'
+                colour = tuple(rng.randrange(256) for _ in range(3))
+                image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+                image.paste(colour, (0, 0, width // 3, height))
+                # A few random blocks so no two images look alike to the duplicate index
+                for _ in range(4):
+                    x, y = rng.randrange(width), rng.randrange(height)
+                    block = tuple(rng.randrange(256) for _ in range(3))
+                    image.paste(block, (x, y, min(width, x + width // 4), min(height, y + height // 4)))
+                image.save(path, quality=90)
+            else:
+                path = folder / f'{source}_{index:04d}.png'
+                write_png(path, width, height, rng)
+            an_hour_ago = time.time() - 3600
+            os.utime(path, (an_hour_ago, an_hour_ago))
+            total += 1
+    return total
+
+
+def install_fake_binaries(bin_dir):
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for name, body in FAKE_BINARIES.items():
+        path = bin_dir / name
+        path.write_text(body)
+        path.chmod(0o755)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class StageRecorder:
+    """Collects the script's own StageTimer spans, summed per cycle.
+
+    With --prefetch a background render is counted in the cycle during
+    which it finished.
+    """
+
+    def __init__(self, cycler):
+        self.current = {}
+        self.output_bytes = 0
+        cycler.timer.listeners.append(self.record)
+
+    def record(self, record):
+        for stage, seconds in record['stages'].items():
+            self.current[stage] = self.current.get(stage, 0.0) + seconds
+        if record['event'] == 'render':
+            self.current['render'] = self.current.get('render', 0.0) + record['total']
+            self.output_bytes = record.get('bytes') or self.output_bytes
+
+    def take(self):
+        stages, self.current = self.current, {}
+        return stages
+
+
+class SpawnCounter:
+    """Counts every subprocess started in this process"""
+
+    def __init__(self):
+        self.count = 0
+        original_init = subprocess.Popen.__init__
+        counter = self
+
+        def counting_init(popen, *args, **kwargs):
+            counter.count += 1
+            original_init(popen, *args, **kwargs)
+
+        subprocess.Popen.__init__ = counting_init
+
+    def take(self):
+        count, self.count = self.count, 0
+        return count
+
+
+def load_cycler_module():
+    spec = importlib.util.spec_from_file_location('multi_monitor_wallpaper', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_benchmark(args):
+    # A fixed default path, not mkdtemp(): image paths feed the selection, so
+    # a random directory name would change the picks between identical runs
+    workdir = Path(args.workdir or Path(tempfile.gettempdir()) / f'mmw-bench-{args.seed}')
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    home = workdir / 'home'
+    rng = random.Random(args.seed)
+    sources = dict((name, int(count)) for name, count in
+                   (item.split('=') for item in args.sources.split(',')))
+    collection = home / '.config' / 'variety' / 'Downloaded'
+    if not collection.exists():
+        print(f"Generating synthetic collection in {collection}...")
+        generated = generate_collection(collection, sources, rng)
+        print(f"Generated {generated} images")
+    if args.cold:
+        shutil.rmtree(home / '.cache', ignore_errors=True)
+    install_fake_binaries(workdir / 'bin')
+
+    # Everything the script derives from HOME/PATH is fixed at import time
+    os.environ['HOME'] = str(home)
+    os.environ['PATH'] = f"{workdir / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ.setdefault('MMW_ONLINE_QUOTES', '0')
+    # Never the gio backend: it would write the real desktop's settings, not the fake dconf
+    os.environ['MMW_SETTINGS_BACKEND'] = 'dconf'
+    # No background threads: they would change the catalog and spawn
+    # subprocesses in the middle of the measured cycles
+    os.environ['MMW_INGEST'] = '0'
+    os.environ['MMW_WATCH_COLLECTION'] = '0'
+    os.environ.setdefault('MMW_PREFETCH', '1' if args.prefetch else '0')
+    if args.profile:
+        os.environ['MMW_OUTPUT_PROFILE'] = args.profile
+    random.seed(args.seed)
+
+    module = load_cycler_module()
+    cycler = module.MultiMonitorWallpaper()
+    recorder = StageRecorder(cycler)
+    spawns = SpawnCounter()
+
+    cycles = []
+    for index in range(args.cycles):
+        started = time.perf_counter()
+        cycler.cycle_wallpapers()
+        total = time.perf_counter() - started
+        stages = recorder.take()
+        stages['cycle'] = total
+        cycles.append({'stages': stages, 'subprocesses': spawns.take(), 'bytes': recorder.output_bytes})
+    if cycler.prefetch_future is not None:
+        cycler.prefetch_future.result()
+
+    if not args.workdir and not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    summary = summarize(cycles)
+    summary['profile'] = cycler.output_profile
+    return summary
+
+
+def summarize(cycles):
+    stage_names = sorted({name for cycle in cycles for name in cycle['stages']})
+    summary = {'cycles': len(cycles), 'stages': {}}
+    for name in stage_names:
+        values = [cycle['stages'].get(name, 0.0) for cycle in cycles]
+        summary['stages'][name] = {
+            'p50': percentile(values, 0.50),
+            'p95': percentile(values, 0.95),
+            'max': max(values),
+        }
+    spawned = [cycle['subprocesses'] for cycle in cycles]
+    summary['subprocesses'] = {
+        'total': sum(spawned),
+        'p50': percentile(spawned, 0.50),
+        'max': max(spawned) if spawned else 0,
+    }
+    summary['output_bytes'] = percentile([cycle.get('bytes', 0) for cycle in cycles], 0.50)
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n{summary['cycles']} cycles")
+    print(f"{'stage':<14}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, stats in summary['stages'].items():
+        print(f"{name:<14}{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+    spawned = summary['subprocesses']
+    print(f"subprocesses: {spawned['total']} total, {spawned['p50']} per cycle (p50), {spawned['max']} max")
+    if 'profile' in summary:
+        print(f"output: {summary['profile']}, {summary['output_bytes'] // 1024} KiB (p50)")
+
+
+def compare(summary, baseline, tolerance):
+    """Print stage-by-stage changes; return True if nothing regressed beyond tolerance"""
+    ok = True
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%}):")
+    for name, stats in summary['stages'].items():
+        reference = baseline['stages'].get(name)
+        if not reference or reference['p50'] <= 0:
+            continue
+        change = stats['p50'] / reference['p50'] - 1
+        regressed = change > tolerance and stats['p50'] - reference['p50'] > 0.005
+        ok &= not regressed
+        marker = 'REGRESSION' if regressed else ''
+        print(f"  {name:<14}{reference['p50'] * 1000:>9.1f} -> {stats['p50'] * 1000:>8.1f} ms ({change:+.0%}) {marker}")
+    reference_spawns = baseline['subprocesses']['p50']
+    if summary['subprocesses']['p50'] > reference_spawns:
+        ok = False
+        print(f"  subprocesses per cycle {reference_spawns} -> {summary['subprocesses']['p50']} REGRESSION")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark wallpaper cycles against a synthetic collection.')
+    parser.add_argument('--cycles', type=int, default=10, help='number of cycles to run (default: 10)')
+    parser.add_argument('--seed', type=int, default=1234, help='RNG seed for collection and selection')
+    parser.add_argument('--sources', default=DEFAULT_SOURCES,
+                        help=f'images per source folder (default: {DEFAULT_SOURCES})')
+    parser.add_argument('--workdir', help='reuse this directory for the collection and caches')
+    parser.add_argument('--keep', action='store_true', help='keep the default work directory (mmw-bench-<seed> in the temp dir)')
+    parser.add_argument('--cold', action='store_true', help='clear ~/.cache in the work directory first')
+    parser.add_argument('--prefetch', action='store_true', help='measure with background prefetch enabled')
+    parser.add_argument('--profile', help='output encoder profile to measure (jpeg, jpeg-fast, png-fast, bmp, tiff)')
+    parser.add_argument('--json', help='write the summary to this file')
+    parser.add_argument('--baseline', help='compare against this stored summary')
+    parser.add_argument('--save-baseline', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p50 slowdown (default: 0.2)')
+    args = parser.parse_args()
+
+    summary = run_benchmark(args)
+    print_summary(summary)
+    for target in (args.json, args.save_baseline):
+        if target:
+            Path(target).write_text(json.dumps(summary, indent=2) + '\n')
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if not compare(summary, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
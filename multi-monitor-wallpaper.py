@@ -9,14 +9,2124 @@ import sys
 import json
 import urllib.request
 import html
+import sqlite3
+import threading
+import ctypes
+import ctypes.util
+import select
+import struct
+import argparse
+import hashlib
+import io
+import re
+import shutil
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+try:
+    import gi
+    gi.require_version('Gio', '2.0')
+    from gi.repository import Gio, GLib
+except (ImportError, ValueError):
+    Gio = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+CACHE_DIR = Path.home() / '.cache' / 'multi-monitor-wallpaper'
+
+
+def env_setting(name, default):
+    """Read an MMW_<name> setting from the environment, typed like its default"""
+    value = os.environ.get(f'MMW_{name}')
+    if value is None:
+        return default
+    try:
+        if isinstance(default, bool):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        if isinstance(default, int):
+            return int(value)
+        if isinstance(default, float):
+            return float(value)
+        return value
+    except ValueError:
+        print(f"WARNING: Ignoring invalid MMW_{name}={value!r}")
+        return default
+
+
+MEMORY_FILESYSTEMS = ('tmpfs', 'ramfs')
+
+
+def filesystem_type(path):
+    """Type of the filesystem holding path, from the longest matching mount point"""
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    try:
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+                if inside and len(mount_point) >= len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:
+        pass
+    return fstype
+
+
+def scratch_directory():
+    """Private directory for per-cycle intermediates, in RAM when possible.
+
+    Tries $XDG_RUNTIME_DIR, /run/user/<uid> and /dev/shm, using the first one
+    on tmpfs, and falls back to ~/.cache (which may be on disk or NFS).
+    """
+    candidates = [os.environ.get('XDG_RUNTIME_DIR'), f'/run/user/{os.getuid()}', '/dev/shm']
+    for candidate in candidates:
+        if not candidate or not os.path.isdir(candidate) or not os.access(candidate, os.W_OK):
+            continue
+        if filesystem_type(candidate) not in MEMORY_FILESYSTEMS:
+            continue
+        directory = Path(candidate) / f'multi-monitor-wallpaper-{os.getuid()}'
+        try:
+            directory.mkdir(mode=0o700, exist_ok=True)
+            if directory.stat().st_uid == os.getuid():
+                return directory
+        except OSError:
+            pass
+    directory = CACHE_DIR / 'tmp'
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def staging_path(path):
+    """Sibling of path to write first and then os.replace() over it, so the
+    desktop never sees a half-written file"""
+    path = Path(path)
+    return path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_image_size(path):
+    """Read (width, height) from a JPEG, PNG, BMP or GIF header without decoding.
+
+    Only the header bytes are read; JPEG segments before the SOF marker are
+    skipped with seek(). Returns None for formats (or files) it cannot parse.
+    """
+    with open(path, 'rb') as f:
+        return read_image_size_from(f)
+
+
+def read_image_size_from(f):
+    """read_image_size() for an already open binary file object"""
+    head = f.read(32)
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+        return struct.unpack('>II', head[16:24])
+    if head[:2] == b'BM' and len(head) >= 26:
+        if struct.unpack('<I', head[14:18])[0] == 12:  # OS/2 BITMAPCOREHEADER
+            return struct.unpack('<HH', head[18:22])
+        width, height = struct.unpack('<ii', head[18:26])
+        return width, abs(height)  # Negative height marks a top-down bitmap
+    if head[:4] == b'GIF8' and len(head) >= 10:
+        return struct.unpack('<HH', head[6:10])
+    if head[:2] != b'\xff\xd8':
+        return None
+
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':  # Markers may be preceded by fill bytes
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            continue  # Standalone markers carry no length
+        if marker in (0xD9, 0xDA):
+            return None  # Reached image data without a frame header
+        segment = f.read(2)
+        if len(segment) < 2:
+            return None
+        length = struct.unpack('>H', segment)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+class RenderResult(namedtuple('RenderResult', 'path width height bytes sha256 sources')):
+    """What a render actually produced: output file, geometry, size, content
+    hash and the source images used, so it can be checked without re-reading
+    the file. width/height are None when they could not be determined.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_bytes(cls, path, data, width, height, sources):
+        return cls(Path(path), width, height, len(data), hashlib.sha256(data).hexdigest(), tuple(sources))
+
+    @classmethod
+    def from_file(cls, path, sources):
+        """For renders written by an external tool: one read, geometry from the header"""
+        data = Path(path).read_bytes()
+        width, height = read_image_size(path) or (None, None)
+        return cls.from_bytes(path, data, width, height, sources)
+
+
+class DiskLRUCache:
+    """Content-addressed files in a directory, evicted least-recently-used
+    once their total size exceeds max_bytes. A hit refreshes the file's mtime,
+    so the recency order survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # filename -> bytes, least recently used first
+        self.total_bytes = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and '.tmp' not in entry.name:
+                st = entry.stat()
+                existing.append((st.st_mtime, entry.name, st.st_size))
+        for _mtime, name, size in sorted(existing):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+    def path_for(self, key, suffix):
+        return self.directory / f'{key}{suffix}'
+
+    def temp_path_for(self, key, suffix):
+        """Scratch path to render into before add() moves it into place"""
+        return self.directory / f'{key}.tmp{os.getpid()}-{threading.get_ident()}{suffix}'
+
+    def get(self, key, suffix):
+        """Return the cached file for key, or None on a miss"""
+        name = f'{key}{suffix}'
+        path = self.directory / name
+        with self.lock:
+            if name not in self.entries:
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                self.total_bytes -= self.entries.pop(name)
+                return None
+            self.entries.move_to_end(name)
+        return path
+
+    def add(self, key, suffix, temp_path):
+        """Atomically move a freshly rendered file into the cache"""
+        name = f'{key}{suffix}'
+        path = self.directory / name
+        os.replace(temp_path, path)
+        size = path.stat().st_size
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                (self.directory / name).unlink()
+            except OSError:
+                pass
+
+
+# Encoders for the finished wallpaper: (format, options) per engine. GNOME
+# decodes the file again for the desktop and the lock screen, so a larger
+# file that is cheaper to encode and decode can win end to end.
+OUTPUT_PROFILES = {
+    'jpeg': {
+        'suffix': '.jpg',
+        'pillow': ('JPEG', {'quality': 92}),
+        'imagemagick': ('jpg', ['-quality', '92']),
+    },
+    'jpeg-fast': {
+        'suffix': '.jpg',
+        'pillow': ('JPEG', {'quality': 80, 'subsampling': '4:2:0'}),
+        'imagemagick': ('jpg', ['-quality', '80', '-sampling-factor', '4:2:0', '-define', 'jpeg:dct-method=fast']),
+    },
+    'png-fast': {
+        'suffix': '.png',
+        'pillow': ('PNG', {'compress_level': 1}),
+        'imagemagick': ('png', ['-define', 'png:compression-level=1']),
+    },
+    'bmp': {
+        'suffix': '.bmp',
+        'pillow': ('BMP', {}),
+        'imagemagick': ('bmp3', []),
+    },
+    'tiff': {
+        'suffix': '.tif',
+        'pillow': ('TIFF', {'compression': 'raw'}),
+        'imagemagick': ('tiff', ['-compress', 'None']),
+    },
+}
+
+
+# Shrink-on-load decodes to at least this multiple of the tile size, leaving
+# the final resize filter some detail to work with
+DECODE_HEADROOM = 2
+
+
+def render_tile_imagemagick(source, width, height, background, resize_filter, output):
+    """Letterbox one source image to exactly width x height; returns True on success"""
+    cmd = [
+        'convert',
+        # libjpeg scales by 1/2, 1/4 or 1/8 while decoding, so a 8K APOD
+        # original never exists in memory at full size (ignored for non-JPEG)
+        '-define', f'jpeg:size={width * DECODE_HEADROOM}x{height * DECODE_HEADROOM}',
+        str(source),
+        '-filter', resize_filter,
+        '-resize', f'{width}x{height}',   # Preserve aspect ratio
+        '-background', background,        # Border colour
+        '-gravity', 'center',             # Center the image
+        '-extent', f'{width}x{height}',   # Add borders to exact size
+        '-define', 'png:compression-level=1',
+        str(output)
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print(f"ERROR: ImageMagick tile render failed for {os.path.basename(str(source))}: {result.stderr}")
+        return False
+    return True
+
+
+PILLOW_FILTERS = {
+    'lanczos': 'LANCZOS',
+    'mitchell': 'BICUBIC',
+    'catrom': 'BICUBIC',
+    'cubic': 'BICUBIC',
+    'triangle': 'BILINEAR',
+    'hamming': 'HAMMING',
+    'box': 'BOX',
+    'point': 'NEAREST',
+}
+
+
+def render_tile_pillow(source, width, height, background, resize_filter, output=None):
+    """In-process equivalent of render_tile_imagemagick; returns the RGB tile image"""
+    resample = getattr(Image, PILLOW_FILTERS.get(resize_filter.lower(), 'LANCZOS'))
+    with Image.open(source) as img:
+        # Same geometry as ImageMagick's -resize WxH: fit inside, keep aspect
+        # ratio, computed from the header size before any reduced decode
+        scale = min(width / img.width, height / img.height)
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        if scale < 1:
+            # JPEG: DCT-domain downscale while decoding (no-op for other formats)
+            img.draft('RGB', (size[0] * DECODE_HEADROOM, size[1] * DECODE_HEADROOM))
+        if img.mode == 'RGB':
+            img.load()  # No full-size copy just to change nothing
+        else:
+            img = img.convert('RGB')
+        if size != img.size:
+            # reducing_gap box-reduces large images (e.g. big PNGs that cannot
+            # be decoded smaller) by an integer factor before the real filter
+            img = img.resize(size, resample, reducing_gap=DECODE_HEADROOM)
+    tile = Image.new('RGB', (width, height), background)
+    tile.paste(img, ((width - img.width) // 2, (height - img.height) // 2))
+    if output is not None:
+        tile.save(output, 'PNG', compress_level=1)
+    return tile
+
+
+class ImageCatalog:
+    """Persistent SQLite index of the wallpaper collection.
+
+    Stores path, source folder, size, mtime and (once known) dimensions of
+    every image, plus what ingestion found out about it: aspect ratio,
+    content hash, perceptual hash (dHash, stored as a signed 64-bit integer)
+    and status ('ok', 'invalid', or NULL while pending).
+    refresh() only lists directories whose mtime changed since the previous
+    refresh, so an unchanged collection costs one stat() per folder instead
+    of a full os.walk.
+    """
+
+    def __init__(self, root, db_path):
+        self.root = str(root)
+        self.lock = threading.RLock()
+        self.version = 0  # Bumped whenever a refresh changes the index
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._create_tables()
+        except sqlite3.Error as e:
+            print(f"WARNING: Could not open image catalog {db_path}: {e}, using in-memory catalog")
+            self.db = sqlite3.connect(':memory:', check_same_thread=False)
+            self._create_tables()
+
+    def _create_tables(self):
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                source TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS images_dir ON images(dir);
+            CREATE INDEX IF NOT EXISTS images_source ON images(source);
+        ''')
+        # Ingestion columns, added in place to catalogs created before them
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(images)')}
+        for column, kind in (('aspect', 'REAL'), ('sha256', 'TEXT'), ('status', 'TEXT'), ('reason', 'TEXT'),
+                             ('dhash', 'INTEGER')):
+            if column not in columns:
+                self.db.execute(f'ALTER TABLE images ADD COLUMN {column} {kind}')
+        if 'dhash' not in columns:
+            # Files ingested before perceptual hashing existed go through ingestion once more
+            self.db.execute('UPDATE images SET status = NULL')
+        # Earlier versions also stored rejections caused by settings or the
+        # environment rather than the file itself; give those files another go
+        self.db.execute("UPDATE images SET status = NULL WHERE status = 'invalid' AND ("
+                        "reason LIKE 'over the render memory budget%' OR reason LIKE '%[Errno %' "
+                        "OR reason LIKE '%ImageMagick could not decode it%')")
+        self.db.commit()
+
+    def refresh(self):
+        """Bring the index up to date, rescanning only changed directories"""
+        with self.lock:
+            known_dirs = {row[0]: row[1] for row in self.db.execute('SELECT path, mtime_ns FROM dirs')}
+            seen_dirs = set()
+            pending = [self.root]
+            while pending:
+                directory = pending.pop()
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                seen_dirs.add(directory)
+                if known_dirs.get(directory) == mtime_ns:
+                    # Unchanged directory: its children are already indexed
+                    pending.extend(row[0] for row in self.db.execute(
+                        'SELECT path FROM dirs WHERE parent = ?', (directory,)))
+                    continue
+                pending.extend(self._rescan_dir(directory, mtime_ns))
+                self.version += 1
+
+            for directory in set(known_dirs) - seen_dirs:
+                self.version += 1
+                self.db.execute('DELETE FROM dirs WHERE path = ?', (directory,))
+                self.db.execute('DELETE FROM images WHERE dir = ?', (directory,))
+            self.db.commit()
+
+    def _rescan_dir(self, directory, mtime_ns):
+        """Re-list one directory, returning its subdirectories"""
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            st = entry.stat()
+                            files[entry.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Could not scan {directory}: {e}")
+            return subdirs
+
+        indexed = {row[0]: (row[1], row[2]) for row in self.db.execute(
+            'SELECT path, size, mtime_ns FROM images WHERE dir = ?', (directory,))}
+        source = os.path.basename(directory)
+        for path in set(indexed) - set(files):
+            self.db.execute('DELETE FROM images WHERE path = ?', (path,))
+        for path, (size, file_mtime) in files.items():
+            if indexed.get(path) != (size, file_mtime):
+                # New or modified file: dimensions must be probed (and the file ingested) again
+                self.db.execute(
+                    'INSERT OR REPLACE INTO images (path, dir, source, size, mtime_ns, width, height) '
+                    'VALUES (?, ?, ?, ?, ?, NULL, NULL)',
+                    (path, directory, source, size, file_mtime))
+
+        # Forget subdirectories that disappeared, record the ones that exist
+        for row in self.db.execute('SELECT path FROM dirs WHERE parent = ?', (directory,)).fetchall():
+            if row[0] not in subdirs:
+                self.db.execute('DELETE FROM dirs WHERE path = ?', (row[0],))
+        for subdir in subdirs:
+            self.db.execute('INSERT OR IGNORE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, -1)',
+                            (subdir, directory))
+        self.db.execute('INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)',
+                        (directory, os.path.dirname(directory) if directory != self.root else None, mtime_ns))
+        return subdirs
+
+    def get_dimensions(self, path, size, mtime_ns):
+        """Return cached (width, height) if the file is unchanged since it was probed"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT width, height FROM images WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (path, size, mtime_ns)).fetchone()
+        if row and row[0] is not None:
+            return row[0], row[1]
+        return None
+
+    def set_dimensions(self, path, size, mtime_ns, width, height):
+        with self.lock:
+            self.db.execute(
+                'UPDATE images SET width = ?, height = ? WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (width, height, path, size, mtime_ns))
+            self.db.commit()
+
+    def pending_ingest(self, limit=50, after=''):
+        """(path, size, mtime_ns) of files not ingested yet, in path order after `after`"""
+        with self.lock:
+            return self.db.execute(
+                'SELECT path, size, mtime_ns FROM images WHERE status IS NULL AND path > ? ORDER BY path LIMIT ?',
+                (after, limit)).fetchall()
+
+    def record_ingest(self, path, size, mtime_ns, status, width=None, height=None, sha256=None, reason=None,
+                      dhash=None):
+        """Store an ingestion result, along with the size/mtime of the bytes it was computed from"""
+        aspect = width / height if width and height else None
+        with self.lock:
+            self.db.execute(
+                'UPDATE images SET size = ?, mtime_ns = ?, status = ?, width = ?, height = ?, aspect = ?, '
+                'sha256 = ?, reason = ?, dhash = ? WHERE path = ?',
+                (size, mtime_ns, status, width, height, aspect, sha256, reason, self._signed(dhash), path))
+            self.db.commit()
+
+    @staticmethod
+    def _signed(value):
+        """SQLite integers are signed 64-bit"""
+        if value is not None and value >= 1 << 63:
+            return value - (1 << 64)
+        return value
+
+    def set_dhash(self, path, size, mtime_ns, dhash):
+        with self.lock:
+            self.db.execute('UPDATE images SET dhash = ? WHERE path = ? AND size = ? AND mtime_ns = ?',
+                            (self._signed(dhash), path, size, mtime_ns))
+            self.db.commit()
+
+    def missing_dhashes(self):
+        """(path, size, mtime_ns) of files that could be usable but have no perceptual hash"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT path, size, mtime_ns FROM images WHERE dhash IS NULL AND status IS NOT 'invalid'").fetchall()
+
+    def perceptual_hashes(self):
+        """Map path -> unsigned 64-bit dHash for every hashed, usable image"""
+        with self.lock:
+            return {path: dhash & 0xFFFFFFFFFFFFFFFF for path, dhash in self.db.execute(
+                "SELECT path, dhash FROM images WHERE dhash IS NOT NULL AND status IS NOT 'invalid'")}
+
+    def describe(self, paths):
+        """Map path -> (size, width, height) for reporting"""
+        with self.lock:
+            return {row[0]: row[1:] for row in self.db.execute(
+                'SELECT path, size, width, height FROM images') if row[0] in paths}
+
+    def ingest_states(self):
+        """Map path -> ingestion status (None while pending)"""
+        with self.lock:
+            return dict(self.db.execute('SELECT path, status FROM images'))
+
+    def count(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def paths(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute('SELECT path FROM images')]
+
+    def paths_by_source(self):
+        with self.lock:
+            by_source = {}
+            for path, source in self.db.execute('SELECT path, source FROM images'):
+                by_source.setdefault(source, []).append(path)
+            return by_source
+
+
+class CollectionWatcher:
+    """Live in-memory view of the collection, grouped by source folder.
+
+    Uses inotify when libc provides it and falls back to polling otherwise.
+    A file only becomes selectable once it is complete: after IN_CLOSE_WRITE
+    or after being renamed into place (IN_MOVED_TO). Temporary download names
+    are ignored, and in polling mode a file must keep the same size and mtime
+    for two consecutive polls.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                  IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload', '.download')
+    SETTLE_SECONDS = 2
+
+    def __init__(self, root, poll_interval=10):
+        self.root = str(root)
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.images_by_source = {}
+        self.version = 0  # Bumped on every change so consumers can skip resyncs
+        self.pending = {}  # Polling mode: path -> (size, mtime_ns) seen on the last poll
+        self.watches = {}  # inotify watch descriptor -> directory
+        self.settling = {}  # inotify mode: recently modified files found by a tree scan
+        self.inotify_fd = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Index the collection once, then keep it current in a daemon thread"""
+        self.running = True
+        self.inotify_fd = self._init_inotify()
+        if self.inotify_fd is not None:
+            self._watch_tree(self.root)
+            target, mode = self._inotify_loop, 'inotify'
+        else:
+            self._poll_once(initial=True)
+            target, mode = self._poll_loop, f'polling every {self.poll_interval}s'
+        self.thread = threading.Thread(target=target, name='collection-watcher', daemon=True)
+        self.thread.start()
+        print(f"Watching collection ({mode}): {self.count()} images")
+
+    def stop(self):
+        self.running = False
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+    def count(self):
+        with self.lock:
+            return sum(len(paths) for paths in self.images_by_source.values())
+
+    def snapshot(self):
+        """Return {source: [paths]} for every complete image"""
+        with self.lock:
+            return {source: list(paths) for source, paths in self.images_by_source.items() if paths}
+
+    def is_candidate(self, name):
+        lower = name.lower()
+        return (not name.startswith('.') and lower.endswith(IMAGE_EXTENSIONS)
+                and not lower.endswith(self.PARTIAL_SUFFIXES))
+
+    def _add(self, path):
+        try:
+            if os.path.getsize(path) == 0:
+                return
+        except OSError:
+            return
+        source = os.path.basename(os.path.dirname(path))
+        with self.lock:
+            paths = self.images_by_source.setdefault(source, set())
+            if path not in paths:
+                paths.add(path)
+                self.version += 1
+
+    def _remove(self, path):
+        source = os.path.basename(os.path.dirname(path))
+        with self.lock:
+            paths = self.images_by_source.get(source)
+            if paths and path in paths:
+                paths.discard(path)
+                self.version += 1
+
+    def _remove_tree(self, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self.lock:
+            for paths in self.images_by_source.values():
+                stale = [p for p in paths if p.startswith(prefix)]
+                paths.difference_update(stale)
+            self.version += 1
+
+    # inotify mode
+
+    def _init_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+            self.libc = libc
+            return fd
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+            return None
+
+    def _watch_tree(self, top):
+        """Watch top and its subdirectories, indexing files already present"""
+        now = time.time()
+        for directory, dirs, files in os.walk(top):
+            wd = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(directory), self.WATCH_MASK)
+            if wd >= 0:
+                self.watches[wd] = directory
+            for name in files:
+                if not self.is_candidate(name):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if now - os.path.getmtime(path) < self.SETTLE_SECONDS:
+                        # Possibly still being written; added on IN_CLOSE_WRITE or once it settles
+                        self.settling[path] = True
+                        continue
+                except OSError:
+                    continue
+                self._add(path)
+
+    def _inotify_loop(self):
+        fd = self.inotify_fd
+        while self.running:
+            self._promote_settled()
+            try:
+                ready, _, _ = select.select([fd], [], [], 1.0)
+                if not ready:
+                    continue
+                data = os.read(fd, 64 * 1024)
+            except (OSError, ValueError):
+                break  # stop() closed the descriptor
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                self._handle_event(wd, mask, name)
+
+    def _promote_settled(self):
+        """Add files found mid-write during a tree scan once they stop changing"""
+        if not self.settling:
+            return
+        now = time.time()
+        for path in list(self.settling):
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                del self.settling[path]
+                continue
+            if now - mtime >= self.SETTLE_SECONDS:
+                del self.settling[path]
+                self._add(path)
+
+    def _handle_event(self, wd, mask, name):
+        if mask & self.IN_Q_OVERFLOW:
+            print("inotify queue overflowed, re-indexing collection")
+            with self.lock:
+                self.images_by_source = {}
+                self.version += 1
+            self._watch_tree(self.root)
+            return
+        directory = self.watches.get(wd)
+        if directory is None:
+            return
+        if mask & self.IN_IGNORED:
+            del self.watches[wd]
+            return
+        if mask & self.IN_MOVE_SELF and directory != self.root:
+            # A renamed subdirectory: the parent's IN_MOVED_FROM/IN_MOVED_TO
+            # already re-pointed this watch at the new path
+            return
+        if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+            self._remove_tree(directory)
+            if mask & self.IN_MOVE_SELF:
+                # The old path no longer names this directory; stop watching it
+                self.libc.inotify_rm_watch(self.inotify_fd, wd)
+            return
+        path = os.path.join(directory, name)
+        if mask & self.IN_ISDIR:
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                self._watch_tree(path)
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self._remove_tree(path)
+            return
+        if not self.is_candidate(name):
+            return
+        if mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+            self.settling.pop(path, None)
+            self._add(path)
+        elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+            self._remove(path)
+        # IN_CREATE alone means the download has only just started
+
+    # Polling mode
+
+    def _poll_loop(self):
+        while self.running:
+            time.sleep(self.poll_interval)
+            self._poll_once()
+
+    def _poll_once(self, initial=False):
+        now = time.time()
+        current = {}
+        for directory, dirs, files in os.walk(self.root):
+            for name in files:
+                if not self.is_candidate(name):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                current[path] = (st.st_size, st.st_mtime_ns)
+
+        with self.lock:
+            known = set().union(*self.images_by_source.values()) if self.images_by_source else set()
+        for path in known - set(current):
+            self._remove(path)
+        for path, signature in current.items():
+            if path in known:
+                continue
+            # Only accept settled files whose size and mtime held still since the last poll
+            settled = now - signature[1] / 1e9 >= self.SETTLE_SECONDS
+            if settled and (initial or self.pending.get(path) == signature):
+                self._add(path)
+        with self.lock:
+            known = set().union(*self.images_by_source.values()) if self.images_by_source else set()
+        self.pending = {path: sig for path, sig in current.items() if path not in known}
+
+
+class IngestionWorker:
+    """Processes every new file in the catalog once, in a low-priority thread.
+
+    process(path, size, mtime_ns) does the actual work and returns True once
+    it has recorded a status for the file in the catalog, or False to leave
+    it pending (still being written, or a failure that is not the file's
+    fault); such files are retried on later passes, at most MAX_ATTEMPTS
+    times per version of the file. `version` changes whenever a file has
+    been processed, and `caught_up` becomes True once the backlog that
+    existed at startup has been through one pass.
+    """
+
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, catalog, process, interval=30, niceness=10):
+        self.catalog = catalog
+        self.process = process
+        self.interval = interval
+        self.niceness = niceness
+        self.version = 0
+        self.caught_up = False
+        self.running = False
+        self.wake = threading.Event()
+        self.attempts = {}  # (path, size, mtime_ns) -> passes that left the file pending
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name='ingest', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def poke(self):
+        """Look for new files now rather than at the next interval"""
+        self.wake.set()
+
+    def _lower_priority(self):
+        try:
+            # Linux nice values are per thread, so rendering keeps its priority;
+            # convert processes started from this thread inherit the niceness
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.niceness)
+        except (AttributeError, OSError) as e:
+            print(f"WARNING: Could not lower ingestion priority: {e}")
+
+    def _loop(self):
+        self._lower_priority()
+        processed = 0
+        cursor = ''  # Pending files are walked in path order, so deferred ones wait for the next pass
+        while self.running:
+            batch = []
+            try:
+                self.catalog.refresh()
+                batch = self.catalog.pending_ingest(after=cursor)
+                for path, size, mtime_ns in batch:
+                    if not self.running:
+                        break
+                    cursor = path
+                    key = (path, size, mtime_ns)
+                    if self.attempts.get(key, 0) >= self.MAX_ATTEMPTS:
+                        continue  # Left pending until the file changes or the daemon restarts
+                    try:
+                        done = self.process(path, size, mtime_ns)
+                    except Exception as e:
+                        print(f"WARNING: Could not ingest {os.path.basename(path)}: {e}")
+                        done = False
+                    if done:
+                        self.attempts.pop(key, None)
+                        processed += 1
+                        self.version += 1
+                    else:
+                        self.attempts[key] = self.attempts.get(key, 0) + 1
+            except Exception as e:
+                print(f"WARNING: Ingestion pass failed: {e}")
+            if batch:
+                continue
+            cursor = ''
+            if not self.caught_up:
+                self.caught_up = True
+                self.version += 1
+                print(f"Ingestion caught up ({processed} files processed)")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+
+class GnomeSettingsWriter:
+    """Write GNOME settings keys as one batch, skipping keys already at their value.
+
+    Backends: 'gio' (delayed-apply GSettings objects, flushed with one sync),
+    'dconf' (a single `dconf load` of every changed key) and 'gsettings'
+    (one process per key, the historical behaviour). Current values are read
+    back every time, so changes made by Variety or the user are undone.
+    """
+
+    SCHEMAS = ('org.gnome.desktop.background', 'org.gnome.desktop.screensaver')
+
+    def __init__(self, backend='auto'):
+        if backend == 'gio' and not self._have_schemas():
+            print("WARNING: GNOME desktop schemas not installed, not using the gio settings backend")
+            backend = 'auto'
+        if backend == 'auto':
+            if self._have_schemas():
+                backend = 'gio'
+            elif self._have_dconf():
+                backend = 'dconf'
+            else:
+                backend = 'gsettings'
+        self.backend = backend
+        self.settings = {}  # Gio.Settings per schema
+
+    @staticmethod
+    def _gio_schema_installed(schema):
+        # Gio.Settings.new() on a missing schema aborts the process, so look first
+        source = Gio.SettingsSchemaSource.get_default()
+        return source is not None and source.lookup(schema, True) is not None
+
+    @classmethod
+    def _have_schemas(cls):
+        if Gio is None:
+            return False
+        try:
+            return all(cls._gio_schema_installed(schema) for schema in cls.SCHEMAS)
+        except Exception:
+            return False
+
+    @staticmethod
+    def _have_dconf():
+        return any(os.access(os.path.join(directory, 'dconf'), os.X_OK)
+                   for directory in os.environ.get('PATH', '').split(os.pathsep) if directory)
+
+    def apply(self, values):
+        """values: {(schema, key): string}; returns the number of keys written"""
+        if self.backend == 'gio':
+            try:
+                return self._apply_gio(values)
+            except Exception as e:
+                print(f"WARNING: GSettings write failed ({e}), falling back to dconf/gsettings")
+                self.backend = 'dconf' if self._have_dconf() else 'gsettings'
+        if self.backend == 'dconf':
+            current = self._read_dconf(values)
+            changed = {k: v for k, v in values.items() if current.get(k) != v}
+            if not changed:
+                return 0
+            if self._apply_dconf(changed):
+                return len(changed)
+            print("WARNING: dconf load failed, falling back to gsettings")
+            self.backend = 'gsettings'
+        # No cheap way to read every key back: set them all, as the script always did
+        for (schema, key), value in values.items():
+            subprocess.run(['gsettings', 'set', schema, key, value])
+        return len(values)
+
+    def _apply_gio(self, values):
+        by_schema = {}
+        for (schema, key), value in values.items():
+            by_schema.setdefault(schema, {})[key] = value
+        written = 0
+        for schema, keys in by_schema.items():
+            if schema not in self.settings:
+                if not self._gio_schema_installed(schema):
+                    raise LookupError(f"schema {schema} is not installed")
+                self.settings[schema] = Gio.Settings.new(schema)
+            settings = self.settings[schema]
+            changed = {key: value for key, value in keys.items() if settings.get_string(key) != value}
+            if not changed:
+                continue
+            settings.delay()
+            for key, value in changed.items():
+                settings.set_string(key, value)
+            settings.apply()
+            written += len(changed)
+        if written:
+            Gio.Settings.sync()
+        return written
+
+    @staticmethod
+    def _dconf_location(schema):
+        """'org.gnome.desktop.background' -> ('/org/gnome/desktop/', 'background')"""
+        parent, section = ('/' + schema.replace('.', '/')).rsplit('/', 1)
+        return parent + '/', section
+
+    def _read_dconf(self, values):
+        """Current user values of the keys in values, from one `dconf dump`; {} if unreadable.
+
+        Keys still at their schema default are not in the dump, so they are
+        simply written again.
+        """
+        bases = {self._dconf_location(schema)[0] for schema, _key in values}
+        if len(bases) != 1:
+            return {}
+        base, = bases
+        try:
+            result = subprocess.run(['dconf', 'dump', base], stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True, timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            return {}
+        if result.returncode != 0:
+            return {}
+        schemas = {self._dconf_location(schema)[1]: schema for schema, _key in values}
+        current = {}
+        section = None
+        for line in result.stdout.splitlines():
+            line = line.strip()
+            if line.startswith('[') and line.endswith(']'):
+                section = schemas.get(line[1:-1])
+            elif section and '=' in line:
+                key, value = line.split('=', 1)
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+                    # GVariant string literal (double-quoted when it contains ')
+                    current[(section, key)] = re.sub(r'\\(.)', r'\1', value[1:-1])
+        return current
+
+    def _apply_dconf(self, changed):
+        """Load every changed key with one dconf process; schemas must share a dconf dir"""
+        sections = {}
+        for (schema, key), value in changed.items():
+            base, section = self._dconf_location(schema)
+            sections.setdefault(base, {}).setdefault(section, {})[key] = value
+        if len(sections) != 1:
+            return False
+        (base, groups), = sections.items()
+        lines = []
+        for section, keys in groups.items():
+            lines.append(f'[{section}]')
+            for key, value in keys.items():
+                escaped = value.replace('\\', '\\\\').replace("'", "\\'")
+                lines.append(f"{key}='{escaped}'")
+            lines.append('')
+        result = subprocess.run(['dconf', 'load', base], input='\n'.join(lines), text=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return result.returncode == 0
+
+
+# Source folder groups for source-diverse selection, one wallpaper per group
+SOURCE_CATEGORIES = [
+    ('NASA', ['nasa_apod']),
+    ('Photo', ['Unsplash', 'Bing']),
+    ('Nature', ['wallhaven_nature', 'reddit_r_EarthPorn', 'reddit_r_NaturePorn']),
+]
+
+
+def difference_hash(source):
+    """64-bit dHash of an image (a path or its bytes), or None if it cannot be
+    decoded or is too flat to fingerprint.
+
+    Each bit records whether a pixel of a 9x8 greyscale thumbnail is
+    brighter than its right-hand neighbour, so re-encodes, resizes and
+    small edits of the same picture land a few bits apart.
+    """
+    pixels = None
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+                img.draft('L', (64, 64))  # JPEG: decode at 1/8 scale, greyscale only
+                pixels = img.convert('L').resize((9, 8), Image.BILINEAR, reducing_gap=2).tobytes()
+        except Exception:
+            return None
+    else:
+        cmd = ['convert', '-define', 'jpeg:size=64x64', '-' if isinstance(source, bytes) else f'{source}[0]',
+               '-resize', '9x8!', '-colorspace', 'Gray', '-depth', '8', 'gray:-']
+        try:
+            result = subprocess.run(cmd, input=source if isinstance(source, bytes) else None,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            return None
+        if result.returncode != 0 or len(result.stdout) != 72:
+            return None
+        pixels = result.stdout
+    if max(pixels) - min(pixels) < 8:
+        return None  # Near-uniform images would all hash alike
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = value << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree of 64-bit hashes under Hamming distance.
+
+    search() only descends into children whose edge distance is within
+    radius of the query's distance to the node (triangle inequality), so a
+    small-radius lookup touches a small fraction of the tree.
+    """
+
+    def __init__(self):
+        self.root = None  # [hash, items, {distance: child}]
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """Items whose hash is within radius of value, as (distance, item) pairs"""
+        found = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    pending.append(child)
+        return found
+
+
+class DuplicateIndex:
+    """Near-duplicate lookups over the collection's perceptual hashes"""
+
+    def __init__(self, radius=6):
+        self.radius = radius  # Max differing dHash bits for two files to count as the same picture
+        self.hashes = {}  # path -> dHash
+        self.tree = BKTree()
+
+    def sync(self, hashes):
+        """Add new hashes; rebuild only when files disappeared or changed"""
+        if any(hashes.get(path) != value for path, value in self.hashes.items()):
+            self.hashes = {}
+            self.tree = BKTree()
+        for path, value in hashes.items():
+            if path not in self.hashes:
+                self.hashes[path] = value
+                self.tree.add(value, path)
+
+    def near(self, path):
+        """Other files showing (nearly) the same picture as path"""
+        value = self.hashes.get(path)
+        if value is None or self.radius < 0:
+            return []
+        return [item for _distance, item in self.tree.search(value, self.radius) if item != path]
+
+    def groups(self):
+        """Clusters of two or more near-identical files"""
+        parent = {}
+
+        def root(path):
+            while parent.get(path, path) != path:
+                path = parent[path]
+            return path
+
+        for path in self.hashes:
+            for twin in self.near(path):
+                a, b = root(path), root(twin)
+                if a != b:
+                    parent[b] = a
+        clusters = {}
+        for path in self.hashes:
+            clusters.setdefault(root(path), []).append(path)
+        return [sorted(paths) for paths in clusters.values() if len(paths) > 1]
+
+
+class ShuffledDeck:
+    """Draw without repeats until every card has been dealt, then reshuffle.
+
+    draw(), add() and remove() are O(1); reshuffling is O(n) once per pass
+    through the deck, so amortised O(1) per draw. Removed cards are skipped
+    lazily when they come up.
+    """
+
+    def __init__(self):
+        self.cards = []  # Undealt cards; the top of the deck is the end of the list
+        self.dealt = []
+        self.members = set()
+
+    def __len__(self):
+        return len(self.members)
+
+    def add(self, card):
+        """Insert a new card at a random position among the undealt ones"""
+        if card in self.members:
+            return
+        self.members.add(card)
+        self.cards.append(card)
+        swap = random.randrange(len(self.cards))
+        self.cards[swap], self.cards[-1] = self.cards[-1], self.cards[swap]
+
+    def remove(self, card):
+        self.members.discard(card)
+
+    def undealt(self):
+        """Cards left before the next reshuffle (an upper bound: removals are lazy)"""
+        return len(self.cards)
+
+    def draw(self):
+        """Deal the top card, reshuffling the dealt pile when the deck runs out"""
+        for _ in range(2):
+            while self.cards:
+                card = self.cards.pop()
+                if card in self.members:
+                    self.dealt.append(card)
+                    return card
+            self.cards = [card for card in dict.fromkeys(self.dealt) if card in self.members]
+            self.dealt = []
+            random.shuffle(self.cards)
+        return None
+
+
+class RecencyWindow:
+    """Fixed-size, per-category record of recently shown images that survives restarts.
+
+    Each category keeps at most `capacity` entries of a 64-bit path hash and
+    a timestamp (12 bytes each on disk in CACHE_DIR/recent-<category>.bin);
+    entries older than `horizon_hours` (0 = no time limit) no longer count.
+    """
+
+    RECORD = struct.Struct('<QI')
+
+    def __init__(self, directory, capacity=50, horizon_hours=0):
+        self.directory = Path(directory)
+        self.capacity = capacity
+        self.horizon = horizon_hours * 3600
+        self.rings = {}  # category -> deque of (hash, timestamp)
+        self.counts = {}  # category -> {hash: occurrences in ring}
+
+    @staticmethod
+    def path_hash(path):
+        return int.from_bytes(hashlib.blake2b(str(path).encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def _file(self, category):
+        return self.directory / f'recent-{category}.bin'
+
+    def _ring(self, category):
+        if category not in self.rings:
+            ring = deque(maxlen=self.capacity)
+            try:
+                data = self._file(category).read_bytes()
+                usable = len(data) - len(data) % self.RECORD.size
+                ring.extend(self.RECORD.iter_unpack(data[:usable]))
+            except OSError:
+                pass
+            counts = {}
+            for digest, _stamp in ring:
+                counts[digest] = counts.get(digest, 0) + 1
+            self.rings[category] = ring
+            self.counts[category] = counts
+        return self.rings[category]
+
+    def contains(self, category, path, within=None):
+        """Was path shown in this category within the window (or the last `within` entries)?"""
+        ring = self._ring(category)
+        digest = self.path_hash(path)
+        if not self.counts[category].get(digest):
+            return False
+        if not self.horizon and (within is None or within >= len(ring)):
+            return True
+        return self.age(category, path, within) is not None
+
+    def age(self, category, path, within=None):
+        """How many entries ago path was last shown (0 = most recent), or None"""
+        ring = self._ring(category)
+        digest = self.path_hash(path)
+        cutoff = time.time() - self.horizon if self.horizon else 0
+        for position, (entry, stamp) in enumerate(reversed(ring)):
+            if within is not None and position >= within:
+                break
+            if entry == digest and stamp >= cutoff:
+                return position
+        return None
+
+    def add(self, category, path):
+        ring = self._ring(category)
+        counts = self.counts[category]
+        if len(ring) == ring.maxlen:
+            oldest = ring[0][0]
+            counts[oldest] -= 1
+            if not counts[oldest]:
+                del counts[oldest]
+        digest = self.path_hash(path)
+        ring.append((digest, int(time.time())))
+        counts[digest] = counts.get(digest, 0) + 1
+        self._save(category)
+
+    def _save(self, category):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            target = self._file(category)
+            temp_path = target.with_suffix('.tmp')
+            temp_path.write_bytes(b''.join(self.RECORD.pack(*entry) for entry in self.rings[category]))
+            os.replace(temp_path, target)
+        except OSError as e:
+            print(f"WARNING: Could not save recency window: {e}")
+
+
+class SelectionEngine:
+    """One ShuffledDeck per source category plus one spanning every source"""
+
+    ANY = 'Any'  # Key of the deck holding every image
+
+    def __init__(self, categories, recent, duplicates=None):
+        self.recent = recent
+        self.duplicates = duplicates  # Optional DuplicateIndex for near-duplicate rejection
+        self.source_category = {source: name for name, sources in categories for source in sources}
+        self.decks = {name: ShuffledDeck() for name, _sources in categories}
+        self.decks[self.ANY] = ShuffledDeck()
+        self.known = {}  # source -> set of paths at the last sync
+        self.version = None
+
+    def sync(self, wallpapers_by_source, version):
+        """Apply the difference between the collection and the decks"""
+        for source in set(self.known) - set(wallpapers_by_source):
+            wallpapers_by_source[source] = []
+        for source, paths in wallpapers_by_source.items():
+            current = set(paths)
+            previous = self.known.get(source, set())
+            decks = [self.decks[self.ANY]]
+            if source in self.source_category:
+                decks.append(self.decks[self.source_category[source]])
+            for deck in decks:
+                # Sorted: deck.add() draws from random, so set order would make seeded runs differ
+                for path in sorted(current - previous):
+                    deck.add(path)
+                for path in previous - current:
+                    deck.remove(path)
+            if current:
+                self.known[source] = current
+            else:
+                self.known.pop(source, None)
+        self.version = version
+
+    def source_counts(self):
+        return [(source, len(paths)) for source, paths in self.known.items()]
+
+    def window(self, category):
+        """Entries of the category's history that count as recent.
+
+        Capped at half the deck so a small category always has cards outside
+        the window instead of every card being "recent".
+        """
+        return min(self.recent.capacity, len(self.decks[category]) // 2)
+
+    def shown_recently(self, path):
+        """Was path shown within the window, whichever deck it was drawn from?"""
+        category = self.source_category.get(os.path.basename(os.path.dirname(path)))
+        return (self.recent.contains(self.ANY, path, self.window(self.ANY))
+                or (category is not None and self.recent.contains(category, path, self.window(category))))
+
+    def draw(self, category, exclude=()):
+        """Draw the next card not shown recently, or the least recently shown one.
+
+        Searches at most the rest of the current pass through the deck (the
+        whole deck right after a reshuffle). With a duplicate index, a card
+        whose picture is already in exclude is never drawn, and one whose twin
+        was shown recently counts as recent.
+        """
+        deck = self.decks[category]
+        window = self.window(category)
+        fallback = None
+        fallback_age = -1
+        last_resort = None  # Same picture as one in exclude; better than no image at all
+        for _ in range(deck.undealt() or len(deck)):
+            card = deck.draw()
+            if card is None:
+                break
+            if card in exclude:
+                continue
+            twins = self.duplicates.near(card) if self.duplicates else []
+            if any(twin in exclude for twin in twins):
+                if last_resort is None:
+                    last_resort = card
+                continue
+            age = self.recent.age(category, card, window)
+            if age is None and not any(self.shown_recently(twin) for twin in twins):
+                self.recent.add(category, card)
+                return card
+            if age is None:
+                age = window  # Only a twin was recent; older than anything in the window
+            if age > fallback_age:
+                fallback, fallback_age = card, age
+        if fallback is None:
+            fallback = last_resort
+        if fallback is not None:
+            self.recent.add(category, fallback)
+        return fallback
+
+    def draw_any(self, count, exclude=()):
+        """Draw up to count distinct images from any source, skipping exclude"""
+        picks = []
+        while len(picks) < count:
+            card = self.draw(self.ANY, exclude=list(exclude) + picks)
+            if card is None:
+                break
+            picks.append(card)
+        return picks
+
+
+# Expanded local quotes database (similar to what Variety might have)
+LOCAL_QUOTES = [
+    ("The only way to do great work is to love what you do.", "Steve Jobs"),
+    ("Life is what happens when you're busy making other plans.", "John Lennon"),
+    ("The future belongs to those who believe in the beauty of their dreams.", "Eleanor Roosevelt"),
+    ("It is during our darkest moments that we must focus to see the light.", "Aristotle"),
+    ("The way to get started is to quit talking and begin doing.", "Walt Disney"),
+    ("Don't watch the clock; do what it does. Keep going.", "Sam Levenson"),
+    ("The pessimist sees difficulty in every opportunity. The optimist sees opportunity in every difficulty.", "Winston Churchill"),
+    ("You learn more from failure than from success. Don't let it stop you. Failure builds character.", "Unknown"),
+    ("It's not whether you get knocked down, it's whether you get up.", "Vince Lombardi"),
+    ("We may encounter many defeats but we must not be defeated.", "Maya Angelou"),
+    ("Innovation distinguishes between a leader and a follower.", "Steve Jobs"),
+    ("Be yourself; everyone else is already taken.", "Oscar Wilde"),
+    ("Two things are infinite: the universe and human stupidity; and I'm not sure about the universe.", "Albert Einstein"),
+    ("So many books, so little time.", "Frank Zappa"),
+    ("A room without books is like a body without a soul.", "Marcus Tullius Cicero"),
+    ("If you want to know what a man's like, take a good look at how he treats his inferiors, not his equals.", "J.K. Rowling"),
+    ("Don't walk in front of me… I may not follow. Don't walk behind me… I may not lead. Walk beside me… just be my friend.", "Albert Camus"),
+    ("No one can make you feel inferior without your consent.", "Eleanor Roosevelt"),
+    ("If you tell the truth, you don't have to remember anything.", "Mark Twain"),
+    ("The only impossible journey is the one you never begin.", "Tony Robbins"),
+    ("In the end, we will remember not the words of our enemies, but the silence of our friends.", "Martin Luther King Jr."),
+    ("The best time to plant a tree was 20 years ago. The second best time is now.", "Chinese Proverb"),
+    ("Your time is limited, don't waste it living someone else's life.", "Steve Jobs"),
+    ("Whether you think you can or you think you can't, you're right.", "Henry Ford"),
+    ("The future depends on what you do today.", "Mahatma Gandhi")
+]
+
+def parse_zenquotes(data):
+    quote = json.loads(data)[0]
+    # Over the free-tier limit ZenQuotes still answers 200, with its notice as the "quote"
+    if quote['a'] == 'zenquotes.io' or quote['q'].startswith('Too many requests'):
+        raise ValueError("ZenQuotes rate limit reached")
+    return (quote['q'], quote['a'])
+
+
+# Quote APIs tried in turn by the background fetcher (similar to what Variety might use)
+QUOTE_APIS = [
+    {
+        'url': 'https://zenquotes.io/api/random',
+        'parser': parse_zenquotes
+    },
+    {
+        'url': 'https://api.quotable.io/random',
+        'parser': lambda data: (json.loads(data)['content'], json.loads(data)['author'])
+    }
+]
+
+
+class QuotePool:
+    """Bounded on-disk pool of online quotes, refilled by a background thread.
+
+    The render path only calls pop(), which never touches the network; when
+    the pool is empty (offline, slow APIs) callers fall back to LOCAL_QUOTES.
+    """
+
+    def __init__(self, path, size=50, apis=None, timeout=3, retry_interval=60, fetch_interval=60):
+        self.path = Path(path)
+        self.size = size
+        self.apis = QUOTE_APIS if apis is None else apis
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.fetch_interval = fetch_interval  # Minimum seconds between requests, to stay under API rate limits
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.dirty = False
+        self.quotes = deque(maxlen=size)
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.quotes.extend(tuple(quote) for quote in json.load(f))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._fill_loop, name='quote-fetcher', daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def pop(self):
+        """Take the oldest pooled quote, or None if the pool is empty"""
+        with self.lock:
+            if not self.quotes:
+                return None
+            quote = self.quotes.popleft()
+            self.dirty = True
+        self.wakeup.set()  # Let the fetcher persist and top up the pool
+        return quote
+
+    def fetch(self):
+        """Fetch one quote, trying each API in turn; returns None if all fail"""
+        import ssl
+        # Create SSL context that accepts weaker certificates (for older APIs)
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        for api in self.apis:
+            try:
+                response = urllib.request.urlopen(api['url'], timeout=self.timeout, context=ctx)
+                data = response.read().decode('utf-8')
+                quote_text, quote_author = api['parser'](data)
+                
+                # Clean up author name (remove extra info)
+                if quote_author and quote_author.strip():
+                    quote_author = quote_author.split(',')[0].strip()  # Remove birth dates, etc.
+                else:
+                    quote_author = "Unknown"
+                    
+                return (quote_text, quote_author)
+            except Exception:
+                continue  # Try next API
+        return None
+
+    def _fill_loop(self):
+        next_fetch = time.monotonic()
+        while self.running:
+            with self.lock:
+                full = len(self.quotes) >= self.size
+            if not full and time.monotonic() >= next_fetch:
+                quote = self.fetch()
+                if quote is None:
+                    next_fetch = time.monotonic() + self.retry_interval  # Offline or rate limited
+                else:
+                    next_fetch = time.monotonic() + self.fetch_interval
+                    with self.lock:
+                        if quote not in self.quotes:
+                            self.quotes.append(quote)
+                            self.dirty = True
+                        full = len(self.quotes) >= self.size
+            self._save()
+            # pop() wakes us early to persist the pool; the next fetch still waits its turn
+            self.wakeup.wait(None if full else max(0, next_fetch - time.monotonic()))
+            self.wakeup.clear()
+
+    def _save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            quotes = list(self.quotes)
+            self.dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix('.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(quotes, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"WARNING: Could not save quote pool: {e}")
+
+
+def query_monitors(mode='--current'):
+    """Get monitor information from xrandr.
+
+    '--query' re-probes every output (slow, reads EDIDs); '--current' just
+    reports the layout the X server already knows about.
+    """
+    result = subprocess.run(['xrandr', mode], capture_output=True, text=True)
+    monitors = []
+    for line in result.stdout.split('\n'):
+        if ' connected' in line and not 'disconnected' in line:
+            parts = line.split()
+            monitor_name = parts[0]
+            # Extract resolution and position
+            for part in parts:
+                if '+' in part and 'x' in part:
+                    # Format: 1920x1080+1920+0
+                    res_pos = part.split('+')
+                    resolution = res_pos[0]
+                    x_pos = res_pos[1]
+                    monitors.append({
+                        'name': monitor_name,
+                        'resolution': resolution,
+                        'x_position': int(x_pos)
+                    })
+                    break
+    # Sort by x position to get left/right order
+    monitors.sort(key=lambda x: x['x_position'])
+    return monitors
+
+
+class MonitorWatcher:
+    """Notices monitor hotplug and layout changes.
+
+    With python-xlib installed, a thread listens for RandR change events and
+    the layout is only re-read after one arrives. Otherwise check() runs the
+    cheap `xrandr --current` at most every poll_interval seconds.
+    """
+
+    def __init__(self, monitors, poll_interval=10):
+        self.monitors = monitors
+        self.poll_interval = poll_interval
+        self.changed = threading.Event()
+        self.last_poll = time.monotonic()
+        self.event_driven = self._start_randr_listener()
+
+    def _start_randr_listener(self):
+        try:
+            from Xlib import display
+            from Xlib.ext import randr
+            connection = display.Display()
+            root = connection.screen().root
+            root.xrandr_select_input(randr.RRScreenChangeNotifyMask |
+                                     randr.RRCrtcChangeNotifyMask |
+                                     randr.RROutputChangeNotifyMask)
+        except Exception:
+            return False
+
+        def listen():
+            while True:
+                try:
+                    connection.next_event()
+                except Exception as e:
+                    print(f"RandR event listener stopped ({e}), polling xrandr instead")
+                    self.event_driven = False
+                    return
+                self.changed.set()
+
+        threading.Thread(target=listen, name='randr-events', daemon=True).start()
+        return True
+
+    def check(self):
+        """Return the new monitor list if the layout changed since the last check, else None"""
+        if self.event_driven:
+            if not self.changed.is_set():
+                return None
+            self.changed.clear()
+        elif time.monotonic() - self.last_poll < self.poll_interval:
+            return None
+        self.last_poll = time.monotonic()
+        monitors = query_monitors('--current')
+        if not monitors or monitors == self.monitors:
+            return None
+        self.monitors = monitors
+        return monitors
+
+
+def dbus_call(destination, object_path, method, reply_type='(t)'):
+    """Call a no-argument session bus method, returning its first result or None"""
+    interface = method.rsplit('.', 1)[0]
+    member = method.rsplit('.', 1)[1]
+    try:
+        if Gio is not None:
+            bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            reply = bus.call_sync(destination, object_path, interface, member, None,
+                                  GLib.VariantType.new(reply_type), Gio.DBusCallFlags.NONE, 1000, None)
+            return reply.unpack()[0]
+        result = subprocess.run(['gdbus', 'call', '--session', '--dest', destination,
+                                 '--object-path', object_path, '--method', method],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2)
+        if result.returncode != 0:
+            return None
+        # gdbus prints e.g. "(uint64 123456,)" or "(true,)"
+        value = result.stdout.strip().strip('(),').split()[-1]
+        if value in ('true', 'false'):
+            return value == 'true'
+        return int(value)
+    except Exception:
+        return None
+
+
+class MutterIdleSource:
+    """Session idle time from GNOME Shell's IdleMonitor (works on Wayland and X11)"""
+
+    name = 'mutter'
+
+    def idle_seconds(self):
+        idle_ms = dbus_call('org.gnome.Mutter.IdleMonitor', '/org/gnome/Mutter/IdleMonitor/Core',
+                            'org.gnome.Mutter.IdleMonitor.GetIdletime')
+        return None if idle_ms is None else idle_ms / 1000
+
+    def is_locked(self):
+        return None
+
+
+class ScreenSaverIdleSource:
+    """Lock state from the org.gnome.ScreenSaver D-Bus service"""
+
+    name = 'screensaver'
+
+    def idle_seconds(self):
+        return None
+
+    def is_locked(self):
+        return dbus_call('org.gnome.ScreenSaver', '/org/gnome/ScreenSaver',
+                         'org.gnome.ScreenSaver.GetActive', '(b)')
+
+
+class XScreenSaverIdleSource:
+    """Idle time from the X11 MIT-SCREEN-SAVER extension via xprintidle"""
+
+    name = 'xscreensaver'
+
+    def idle_seconds(self):
+        try:
+            result = subprocess.run(['xprintidle'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True, timeout=2)
+            return int(result.stdout.strip()) / 1000 if result.returncode == 0 else None
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            return None
+
+    def is_locked(self):
+        return None
+
+
+class FakeIdleSource:
+    """Idle source with settable values, for tests and benchmarks"""
+
+    name = 'fake'
+
+    def __init__(self, idle_seconds=0, locked=False):
+        self.idle = idle_seconds
+        self.locked = locked
+
+    def idle_seconds(self):
+        return self.idle
+
+    def is_locked(self):
+        return self.locked
+
+
+IDLE_SOURCES = {
+    'mutter': MutterIdleSource,
+    'screensaver': ScreenSaverIdleSource,
+    'xscreensaver': XScreenSaverIdleSource,
+}
+
+
+class IdlePolicy:
+    """Decides whether rendering should pause because nobody is looking.
+
+    Rendering pauses once the session has been idle for idle_timeout seconds
+    or, with pause_when_locked, while the screen is locked. The first source
+    that answers each question wins.
+    """
+
+    def __init__(self, sources, idle_timeout=1800, pause_when_locked=False):
+        self.sources = sources
+        self.idle_timeout = idle_timeout
+        self.pause_when_locked = pause_when_locked
+
+    @classmethod
+    def from_setting(cls, setting, idle_timeout, pause_when_locked):
+        if setting == 'none' or (idle_timeout <= 0 and not pause_when_locked):
+            return cls([], idle_timeout, pause_when_locked)
+        names = ['mutter', 'screensaver', 'xscreensaver'] if setting == 'auto' else setting.split(',')
+        sources = [IDLE_SOURCES[name]() for name in names if name in IDLE_SOURCES]
+        return cls(sources, idle_timeout, pause_when_locked)
+
+    def _first(self, query):
+        for source in self.sources:
+            value = getattr(source, query)()
+            if value is not None:
+                return value
+        return None
+
+    def should_pause(self):
+        """Return a reason string when rendering should pause, else None"""
+        if self.pause_when_locked and self._first('is_locked'):
+            return "screen is locked"
+        if self.idle_timeout > 0:
+            idle = self._first('idle_seconds')
+            if idle is not None and idle >= self.idle_timeout:
+                return f"idle for {int(idle // 60)} minutes"
+        return None
+
+
+class DeadlineScheduler:
+    """Ticks at fixed monotonic deadlines (start + k * interval), so render
+    time never stretches the period.
+
+    A tick that runs late is recorded in `lateness`; deadlines missed
+    entirely are skipped instead of being run back to back. trigger() is
+    async-signal-safe and requests an immediate extra cycle without moving
+    the schedule.
+    """
+
+    def __init__(self, interval, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.next_deadline = clock() + interval
+        self.lateness = deque(maxlen=100)  # Seconds each recent tick ran after its deadline
+        self.skipped = 0
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        os.set_blocking(self.wake_write, False)
+
+    def trigger(self):
+        try:
+            os.write(self.wake_write, b'!')
+        except BlockingIOError:
+            pass  # A trigger is already pending
+
+    def wait(self, max_wait=None):
+        """Block until the next deadline ('tick'), a trigger ('trigger') or max_wait ('timeout')"""
+        while True:
+            now = self.clock()
+            timeout = self.next_deadline - now
+            if timeout <= 0:
+                missed = int(-timeout // self.interval)
+                if missed:
+                    self.skipped += missed
+                    print(f"Skipping {missed} missed wallpaper tick(s)")
+                deadline = self.next_deadline + missed * self.interval
+                self.lateness.append(now - deadline)
+                self.next_deadline = deadline + self.interval
+                return 'tick'
+            if max_wait is not None:
+                if max_wait <= 0:
+                    return 'timeout'
+                timeout = min(timeout, max_wait)
+            started = self.clock()
+            try:
+                ready, _, _ = select.select([self.wake_read], [], [], timeout)
+            except InterruptedError:
+                ready = []
+            if ready:
+                try:
+                    while os.read(self.wake_read, 64):
+                        pass
+                except BlockingIOError:
+                    pass
+                return 'trigger'
+            if max_wait is not None:
+                max_wait -= self.clock() - started
+
+
+class StageTimer:
+    """Per-stage timing spans for the render and apply pipeline.
+
+    Spans accumulate per thread (the prefetch worker renders while the main
+    thread applies) until flush() closes the record. Each record is written
+    as one JSON line and feeds histograms exported in the node_exporter
+    textfile format, so slow stages can be told apart from slow cycles.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    MAX_JSONL_BYTES = 10 * 1024 * 1024  # Rotated to <name>.1 beyond this
+
+    def __init__(self, jsonl_path='', textfile_path=''):
+        self.jsonl_path = jsonl_path  # '-' prints the lines to stdout
+        self.textfile_path = textfile_path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.histograms = {}  # (metric, stage) -> {'buckets', 'sum', 'count'}
+        self.records = {}  # event -> number of records flushed
+        self.listeners = []  # Called with every flushed record
+
+    def _stages(self):
+        if not hasattr(self.local, 'stages'):
+            self.local.stages = {}
+        return self.local.stages
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = self._stages()
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - started
+
+    def flush(self, event, **fields):
+        """Close this thread's open record, export it and return it"""
+        stages = self._stages()
+        self.local.stages = {}
+        record = {'ts': round(time.time(), 3), 'event': event,
+                  'stages': {stage: round(seconds, 6) for stage, seconds in stages.items()}}
+        record.update(fields)
+        with self.lock:
+            self.records[event] = self.records.get(event, 0) + 1
+            for stage, seconds in stages.items():
+                self._observe('mmw_stage_duration_seconds', stage, seconds)
+            if fields.get('lateness') is not None:
+                self._observe('mmw_tick_lateness_seconds', '', fields['lateness'])
+            self._write_jsonl(record)
+            self._write_textfile()
+        for listener in self.listeners:
+            listener(record)
+        return record
+
+    def _observe(self, metric, stage, seconds):
+        histogram = self.histograms.setdefault((metric, stage), {
+            'buckets': [0] * len(self.BUCKETS), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+    def _write_jsonl(self, record):
+        if not self.jsonl_path:
+            return
+        line = json.dumps(record, sort_keys=True)
+        if self.jsonl_path == '-':
+            print(f"timing {line}")
+            return
+        try:
+            path = Path(self.jsonl_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size > self.MAX_JSONL_BYTES:
+                os.replace(path, path.with_name(path.name + '.1'))
+            with open(path, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"WARNING: Could not write timings to {self.jsonl_path}: {e}")
+
+    def render_textfile(self):
+        lines = [
+            '# HELP mmw_records_total Timing records flushed, by pipeline event.',
+            '# TYPE mmw_records_total counter',
+        ]
+        for event, count in sorted(self.records.items()):
+            lines.append(f'mmw_records_total{{event="{event}"}} {count}')
+        helps = {
+            'mmw_stage_duration_seconds': 'Time spent in each wallpaper pipeline stage.',
+            'mmw_tick_lateness_seconds': 'How long after its deadline each scheduled cycle started.',
+        }
+        for metric, help_text in helps.items():
+            keys = sorted(key for key in self.histograms if key[0] == metric)
+            if not keys:
+                continue
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} histogram')
+            for key in keys:
+                histogram = self.histograms[key]
+                labels = f'stage="{key[1]}",' if key[1] else ''
+                for bound, count in zip(self.BUCKETS, histogram['buckets']):
+                    lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{labels}le="+Inf"}} {histogram["count"]}')
+                labels = f'{{stage="{key[1]}"}}' if key[1] else ''
+                lines.append(f'{metric}_sum{labels} {histogram["sum"]:.6f}')
+                lines.append(f'{metric}_count{labels} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _write_textfile(self):
+        if not self.textfile_path:
+            return
+        # node_exporter may read at any moment, so never expose a partial file
+        path = Path(self.textfile_path)
+        temp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_text(self.render_textfile())
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not write metrics to {path}: {e}")
+
+
+def report_duplicates(wallpaper_dir, radius):
+    """Print groups of near-identical images and the space their extra copies use"""
+    catalog = ImageCatalog(wallpaper_dir, CACHE_DIR / 'catalog.sqlite')
+    catalog.refresh()
+    missing = catalog.missing_dhashes()
+    if missing:
+        print(f"Hashing {len(missing)} images the background ingestion has not reached yet...")
+        for path, size, mtime_ns in missing:
+            catalog.set_dhash(path, size, mtime_ns, difference_hash(path))
+    index = DuplicateIndex(radius)
+    index.sync(catalog.perceptual_hashes())
+    info = catalog.describe(set(index.hashes))
+    groups = sorted(index.groups(), key=len, reverse=True)
+    reclaimable = 0
+    for group in groups:
+        # Keep the largest picture (then the largest file); the other copies could go
+        keep = max(group, key=lambda path: ((info[path][1] or 0) * (info[path][2] or 0), info[path][0]))
+        print(f"\n{len(group)} copies of {os.path.basename(keep)}:")
+        for path in group:
+            size, width, height = info[path]
+            if not width:
+                try:
+                    width, height = read_image_size(path) or (None, None)
+                except OSError:
+                    pass
+            geometry = f"{width}x{height}" if width else "?"
+            print(f"  {'keep' if path == keep else 'dup ':4} {size // 1024:>7} KiB {geometry:>11}  "
+                  f"{os.path.relpath(path, wallpaper_dir)}")
+            if path != keep:
+                reclaimable += size
+    print(f"\n{len(index.hashes)} images indexed, {len(groups)} duplicate groups, "
+          f"{reclaimable / 2**20:.1f} MB reclaimable")
+
+
+PID_FILE = CACHE_DIR / 'daemon.pid'
+
+
+def is_cycler_process(pid):
+    """Is pid a running wallpaper cycler, not some other process that reused the PID?"""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return b'multi-monitor-wallpaper.py' in f.read()
+    except OSError:
+        return False
+
+
+def remove_pid_file():
+    """Remove PID_FILE if it still names this process"""
+    try:
+        if PID_FILE.read_text().strip() == str(os.getpid()):
+            PID_FILE.unlink()
+    except (OSError, ValueError):
+        pass
+
+
+def send_next_command():
+    """Ask the running daemon (via SIGUSR1) to change the wallpaper now"""
+    try:
+        pid = int(PID_FILE.read_text().strip())
+        if not is_cycler_process(pid):
+            # SIGUSR1 would terminate whatever unrelated process now has this PID
+            print(f"Process {pid} from {PID_FILE} is not the wallpaper cycler; is it running?")
+            return False
+        os.kill(pid, signal.SIGUSR1)
+        print(f"Requested a wallpaper change from process {pid}")
+        return True
+    except (OSError, ValueError) as e:
+        print(f"Could not reach the running wallpaper cycler: {e}")
+        return False
+
+
 class MultiMonitorWallpaper:
     def __init__(self):
         self.wallpaper_dir = Path.home() / '.config' / 'variety' / 'Downloaded'
         self.running = True
         self.monitors = self.get_monitors()
-        self.used_wallpapers = set()  # Track recently used wallpapers
+        self.monitor_watcher = MonitorWatcher(self.monitors, env_setting('MONITOR_POLL_INTERVAL', 10))
+        self.catalog = ImageCatalog(self.wallpaper_dir, CACHE_DIR / 'catalog.sqlite')
+        self.tile_background = 'black'
+        self.quote_font = 'Ubuntu-Bold'
+        self.quote_pointsize = 24
+        self.quote_width = 800
+        self.quote_padding = 40
+        self.render_engine = env_setting('RENDER_ENGINE', 'auto')
+        if self.render_engine == 'auto':
+            self.render_engine = 'pillow' if Image is not None else 'imagemagick'
+        elif self.render_engine == 'pillow' and Image is None:
+            print("WARNING: Pillow is not installed, using the ImageMagick render engine")
+            self.render_engine = 'imagemagick'
+        self.pillow_font = None
+        self.overlay_memory = OrderedDict()  # Most recently used quote overlays
+        self.overlay_memory_entries = env_setting('OVERLAY_CACHE_ENTRIES', 16)
+        self.overlay_cache = DiskLRUCache(CACHE_DIR / 'overlays', env_setting('OVERLAY_CACHE_MB', 16) * 1024 * 1024)
+        self.idle_policy = IdlePolicy.from_setting(env_setting('IDLE_SOURCE', 'auto'),
+                                                   env_setting('IDLE_TIMEOUT_MINUTES', 30) * 60,
+                                                   env_setting('PAUSE_WHEN_LOCKED', False))
+        self.idle_check_interval = 5
+        self.settings_writer = GnomeSettingsWriter(env_setting('SETTINGS_BACKEND', 'auto'))
+        self.quote_pool = None
+        if env_setting('ONLINE_QUOTES', True):
+            self.quote_pool = QuotePool(CACHE_DIR / 'quotes.json', env_setting('QUOTE_POOL_SIZE', 50))
+            self.quote_pool.start()
+        self.resize_filter = env_setting('RESIZE_FILTER', 'Lanczos')
+        # Renders report their own geometry; identify re-checks every file only when paranoid
+        self.paranoid_verify = env_setting('PARANOID_VERIFY', False)
+        self.tile_cache = DiskLRUCache(CACHE_DIR / 'tiles', env_setting('TILE_CACHE_MB', 512) * 1024 * 1024)
+        self.render_workers = env_setting('RENDER_WORKERS', min(3, os.cpu_count() or 1))
+        self.tile_pool = None
+        # Tiles rendered by a cycle reach the on-disk cache from a background
+        # thread once the render is done, never on the render path
+        self.tile_writer = None
+        self.pending_tiles = []  # (key, Pillow image or scratch file) awaiting persist_tiles()
+        # Per-render memory and disk budget, shared by the tiles decoded in parallel
+        self.render_memory_mb = env_setting('RENDER_MEMORY_MB', 1024)
+        self.render_disk_mb = env_setting('RENDER_DISK_MB', 2048)
+        self.budget_actions = {'reduced': 0, 'skipped': 0}
+        self.apply_imagemagick_limits()
+        # Prefetch renders the next composite in the background while the
+        # current one is on screen, alternating between two output files
+        self.prefetch = env_setting('PREFETCH', True)
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self.prefetch_future = None
+        self.render_lock = threading.Lock()  # Renders share temp files, so run one at a time
+        # ImageMagick engine: build the whole wallpaper in one convert, or run the steps separately
+        self.fused_imagemagick = env_setting('IMAGEMAGICK_FUSED', True)
+        self.scratch_dir = scratch_directory()  # Intermediates only; tmpfs when available
+        self.output_profile = env_setting('OUTPUT_PROFILE', 'jpeg')
+        if self.output_profile not in OUTPUT_PROFILES:
+            print(f"WARNING: Unknown output profile {self.output_profile!r}, using jpeg "
+                  f"(choose from {', '.join(OUTPUT_PROFILES)})")
+            self.output_profile = 'jpeg'
+        suffix = OUTPUT_PROFILES[self.output_profile]['suffix']
+        self.output_buffers = [Path.home() / '.cache' / f'multi-monitor-wallpaper-{name}{suffix}' for name in ('a', 'b')]
+        self.current_wallpaper = None
+        self.timer = StageTimer(env_setting('TIMINGS_JSONL', ''), env_setting('METRICS_TEXTFILE', ''))
+        self.tick_lateness = None  # Set by run() for the cycle it is about to start
+        self.watcher = None
+        if env_setting('WATCH_COLLECTION', True):
+            self.watcher = CollectionWatcher(self.wallpaper_dir, env_setting('WATCH_POLL_INTERVAL', 10))
+            self.watcher.start()
+        # New downloads are validated, hashed and pre-rendered once, in the background
+        self.ingestor = None
+        self.ingest_started = time.time()
+        if env_setting('INGEST', True):
+            self.ingestor = IngestionWorker(self.catalog, self.ingest_image,
+                                            niceness=env_setting('INGEST_NICE', 10))
+            self.ingestor.start()
+        # Recently shown images, bounded per category and kept across restarts
+        self.recent = RecencyWindow(CACHE_DIR, env_setting('RECENT_IMAGES', 50), env_setting('RECENT_HOURS', 0.0))
+        # The same picture often arrives from several sources under different names
+        self.duplicates = DuplicateIndex(env_setting('DUPLICATE_DISTANCE', 6))
+        self.selector = SelectionEngine(SOURCE_CATEGORIES, self.recent, self.duplicates)
         self.download_counter = 0  # Counter to trigger fresh downloads
         print(f"Wallpaper directory: {self.wallpaper_dir}")
         print(f"Directory exists: {self.wallpaper_dir.exists()}")
@@ -27,37 +2137,12 @@ class MultiMonitorWallpaper:
         
     def get_monitors(self):
         """Get monitor information from xrandr"""
-        result = subprocess.run(['xrandr', '--query'], capture_output=True, text=True)
-        monitors = []
-        for line in result.stdout.split('\n'):
-            if ' connected' in line and not 'disconnected' in line:
-                parts = line.split()
-                monitor_name = parts[0]
-                # Extract resolution and position
-                for part in parts:
-                    if '+' in part and 'x' in part:
-                        # Format: 1920x1080+1920+0
-                        res_pos = part.split('+')
-                        resolution = res_pos[0]
-                        x_pos = res_pos[1]
-                        monitors.append({
-                            'name': monitor_name,
-                            'resolution': resolution,
-                            'x_position': int(x_pos)
-                        })
-                        break
-        # Sort by x position to get left/right order
-        monitors.sort(key=lambda x: x['x_position'])
-        return monitors
+        return query_monitors('--query')
     
     def count_available_images(self):
         """Count available wallpaper images"""
-        count = 0
-        for root, dirs, files in os.walk(self.wallpaper_dir):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    count += 1
-        return count
+        self.catalog.refresh()
+        return self.catalog.count()
     
     def trigger_variety_download(self):
         """Trigger Variety to download fresh wallpapers"""
@@ -74,11 +2159,9 @@ class MultiMonitorWallpaper:
     
     def get_random_wallpapers(self, count=3):
         """Get random wallpaper paths from Variety's downloads"""
-        wallpapers = []
-        for root, dirs, files in os.walk(self.wallpaper_dir):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    wallpapers.append(os.path.join(root, file))
+        with self.timer.span('scan'):
+            self.catalog.refresh()
+            wallpapers = self.catalog.paths()
         
         print(f"Found {len(wallpapers)} wallpapers in collection")
         
@@ -100,17 +2183,12 @@ class MultiMonitorWallpaper:
             self.trigger_variety_download()
         
         # Smart selection: avoid recently used when possible
-        unused_wallpapers = [w for w in wallpapers if w not in self.used_wallpapers]
+        unused_wallpapers = [w for w in wallpapers if not self.recent.contains(SelectionEngine.ANY, w)]
         
         try:
             if len(unused_wallpapers) >= count:
                 selected = random.sample(unused_wallpapers, count)
             else:
-                # Reset used list if we've used most wallpapers
-                if len(self.used_wallpapers) > len(wallpapers) * 0.8:
-                    print("Resetting used wallpaper list for more variety...")
-                    self.used_wallpapers.clear()
-                
                 # Select from all available wallpapers
                 selected = random.sample(wallpapers, count)
         except Exception as e:
@@ -128,224 +2206,628 @@ class MultiMonitorWallpaper:
                         selected[i] = random.choice(alternatives)
         
         # Mark selected wallpapers as used
-        self.used_wallpapers.update(selected)
+        for wallpaper in selected:
+            self.recent.add(SelectionEngine.ANY, wallpaper)
         
-        print(f"Selected: {[os.path.basename(w) for w in selected]} (tracking {len(self.used_wallpapers)}/{len(wallpapers)} used)")
+        print(f"Selected: {[os.path.basename(w) for w in selected]} ({len(unused_wallpapers)}/{len(wallpapers)} not shown recently)")
         return selected
 
+    def collection_version(self):
+        """Counter that changes whenever the collection (or what ingestion knows about it) does"""
+        ingested = self.ingestor.version if self.ingestor else None
+        if self.watcher:
+            return ('watcher', self.watcher.version, ingested)
+        self.catalog.refresh()
+        return ('catalog', self.catalog.version, ingested)
+
+    def get_wallpapers_by_source(self):
+        """Map source folder -> image paths, from the live watcher when running.
+
+        With ingestion enabled, known-bad files are always left out, and once
+        the startup backlog is done only files ingested as good are offered.
+        """
+        if self.watcher:
+            by_source = self.watcher.snapshot()
+        else:
+            self.catalog.refresh()
+            by_source = self.catalog.paths_by_source()
+        if not self.ingestor:
+            return by_source
+        self.ingestor.poke()
+        states = self.catalog.ingest_states()
+        if self.ingestor.caught_up:
+            return {source: [path for path in paths if states.get(path) == 'ok']
+                    for source, paths in by_source.items()}
+        return {source: [path for path in paths if states.get(path) != 'invalid']
+                for source, paths in by_source.items()}
+
     def get_source_diverse_wallpapers(self, count=3):
         """Get wallpapers ensuring source diversity: NASA + (Unsplash|Bing) + (Wallhaven|Reddit nature)"""
-        # Define source categories
-        nasa_sources = ['nasa_apod']
-        photo_sources = ['Unsplash', 'Bing']
-        nature_sources = ['wallhaven_nature', 'reddit_r_EarthPorn', 'reddit_r_NaturePorn']
-
-        # Categorize all wallpapers by source
-        wallpapers_by_source = {}
-        for root, dirs, files in os.walk(self.wallpaper_dir):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    full_path = os.path.join(root, file)
-                    source_folder = os.path.basename(root)
-                    if source_folder not in wallpapers_by_source:
-                        wallpapers_by_source[source_folder] = []
-                    wallpapers_by_source[source_folder].append(full_path)
-
-        print(f"Source breakdown: {[(k, len(v)) for k, v in wallpapers_by_source.items()]}")
-
-        # Select one from each category
-        selected = []
-        sources_used = []
-
-        # 1. Select from NASA sources
-        nasa_wallpapers = []
-        for source in nasa_sources:
-            if source in wallpapers_by_source:
-                unused = [w for w in wallpapers_by_source[source] if w not in self.used_wallpapers]
-                if unused:
-                    nasa_wallpapers.extend(unused)
-                else:
-                    nasa_wallpapers.extend(wallpapers_by_source[source])
-
-        if nasa_wallpapers:
-            nasa_pick = random.choice(nasa_wallpapers)
-            selected.append(nasa_pick)
-            sources_used.append(os.path.basename(os.path.dirname(nasa_pick)))
-            print(f"NASA selection: {os.path.basename(nasa_pick)} from {sources_used[-1]}")
-
-        # 2. Select from photo sources (Unsplash or Bing)
-        photo_wallpapers = []
-        for source in photo_sources:
-            if source in wallpapers_by_source:
-                unused = [w for w in wallpapers_by_source[source] if w not in self.used_wallpapers]
-                if unused:
-                    photo_wallpapers.extend([(w, source) for w in unused])
-                else:
-                    photo_wallpapers.extend([(w, source) for w in wallpapers_by_source[source]])
-
-        if photo_wallpapers:
-            photo_pick, photo_source = random.choice(photo_wallpapers)
-            selected.append(photo_pick)
-            sources_used.append(photo_source)
-            print(f"Photo selection: {os.path.basename(photo_pick)} from {photo_source}")
-
-        # 3. Select from nature sources (Wallhaven or Reddit)
-        nature_wallpapers = []
-        for source in nature_sources:
-            if source in wallpapers_by_source:
-                unused = [w for w in wallpapers_by_source[source] if w not in self.used_wallpapers]
-                if unused:
-                    nature_wallpapers.extend([(w, source) for w in unused])
-                else:
-                    nature_wallpapers.extend([(w, source) for w in wallpapers_by_source[source]])
-
-        if nature_wallpapers:
-            nature_pick, nature_source = random.choice(nature_wallpapers)
-            selected.append(nature_pick)
-            sources_used.append(nature_source)
-            print(f"Nature selection: {os.path.basename(nature_pick)} from {nature_source}")
-
-        # If we don't have enough, fall back to random selection from all sources
-        if len(selected) < count:
-            print(f"Only found {len(selected)} source-diverse images, filling remaining with random selection...")
-            all_wallpapers = []
-            for wallpaper_list in wallpapers_by_source.values():
-                all_wallpapers.extend(wallpaper_list)
-
-            remaining_needed = count - len(selected)
-            available = [w for w in all_wallpapers if w not in selected]
-            if available:
-                additional = random.sample(available, min(remaining_needed, len(available)))
+        with self.timer.span('scan'):
+            # Only re-read the collection when it changed since the last cycle
+            version = self.collection_version()
+            if version != self.selector.version:
+                self.duplicates.sync(self.catalog.perceptual_hashes())
+                self.selector.sync(self.get_wallpapers_by_source(), version)
+
+        with self.timer.span('select'):
+            print(f"Source breakdown: {self.selector.source_counts()}")
+
+            # Select one from each category, taking the top card of its deck
+            selected = []
+            sources_used = []
+            for category, _sources in SOURCE_CATEGORIES:
+                pick = self.selector.draw(category, exclude=selected)
+                if pick:
+                    selected.append(pick)
+                    sources_used.append(os.path.basename(os.path.dirname(pick)))
+                    print(f"{category} selection: {os.path.basename(pick)} from {sources_used[-1]}")
+
+            # If we don't have enough, fall back to random selection from all sources
+            if len(selected) < count:
+                print(f"Only found {len(selected)} source-diverse images, filling remaining with random selection...")
+                additional = self.selector.draw_any(count - len(selected), exclude=selected)
                 selected.extend(additional)
                 for add_path in additional:
                     add_source = os.path.basename(os.path.dirname(add_path))
                     print(f"Additional selection: {os.path.basename(add_path)} from {add_source}")
 
-        # Mark selected wallpapers as used
-        self.used_wallpapers.update(selected)
-
         print(f"Source-diverse selection complete: {len(selected)} wallpapers from sources: {sources_used}")
         return selected[:count]
 
     def get_quote(self):
-        """Get a random quote from multiple sources like Variety uses"""
-        # Expanded local quotes database (similar to what Variety might have)
-        quotes = [
-            ("The only way to do great work is to love what you do.", "Steve Jobs"),
-            ("Life is what happens when you're busy making other plans.", "John Lennon"),
-            ("The future belongs to those who believe in the beauty of their dreams.", "Eleanor Roosevelt"),
-            ("It is during our darkest moments that we must focus to see the light.", "Aristotle"),
-            ("The way to get started is to quit talking and begin doing.", "Walt Disney"),
-            ("Don't watch the clock; do what it does. Keep going.", "Sam Levenson"),
-            ("The pessimist sees difficulty in every opportunity. The optimist sees opportunity in every difficulty.", "Winston Churchill"),
-            ("You learn more from failure than from success. Don't let it stop you. Failure builds character.", "Unknown"),
-            ("It's not whether you get knocked down, it's whether you get up.", "Vince Lombardi"),
-            ("We may encounter many defeats but we must not be defeated.", "Maya Angelou"),
-            ("Innovation distinguishes between a leader and a follower.", "Steve Jobs"),
-            ("Be yourself; everyone else is already taken.", "Oscar Wilde"),
-            ("Two things are infinite: the universe and human stupidity; and I'm not sure about the universe.", "Albert Einstein"),
-            ("So many books, so little time.", "Frank Zappa"),
-            ("A room without books is like a body without a soul.", "Marcus Tullius Cicero"),
-            ("If you want to know what a man's like, take a good look at how he treats his inferiors, not his equals.", "J.K. Rowling"),
-            ("Don't walk in front of me… I may not follow. Don't walk behind me… I may not lead. Walk beside me… just be my friend.", "Albert Camus"),
-            ("No one can make you feel inferior without your consent.", "Eleanor Roosevelt"),
-            ("If you tell the truth, you don't have to remember anything.", "Mark Twain"),
-            ("The only impossible journey is the one you never begin.", "Tony Robbins"),
-            ("In the end, we will remember not the words of our enemies, but the silence of our friends.", "Martin Luther King Jr."),
-            ("The best time to plant a tree was 20 years ago. The second best time is now.", "Chinese Proverb"),
-            ("Your time is limited, don't waste it living someone else's life.", "Steve Jobs"),
-            ("Whether you think you can or you think you can't, you're right.", "Henry Ford"),
-            ("The future depends on what you do today.", "Mahatma Gandhi")
-        ]
-        
-        # Try multiple quote APIs (similar to what Variety might use)
-        quote_apis = [
-            {
-                'url': 'https://zenquotes.io/api/random',
-                'parser': lambda data: (json.loads(data)[0]['q'], json.loads(data)[0]['a'])
-            },
-            {
-                'url': 'https://api.quotable.io/random',
-                'parser': lambda data: (json.loads(data)['content'], json.loads(data)['author'])
-            }
-        ]
-        
-        # Try each API
-        for api in quote_apis:
-            try:
-                import ssl
-                # Create SSL context that accepts weaker certificates (for older APIs)
-                ctx = ssl.create_default_context()
-                ctx.check_hostname = False
-                ctx.verify_mode = ssl.CERT_NONE
-                
-                response = urllib.request.urlopen(api['url'], timeout=3, context=ctx)
-                data = response.read().decode('utf-8')
-                quote_text, quote_author = api['parser'](data)
-                
-                # Clean up author name (remove extra info)
-                if quote_author and quote_author.strip():
-                    quote_author = quote_author.split(',')[0].strip()  # Remove birth dates, etc.
-                else:
-                    quote_author = "Unknown"
-                    
-                return (quote_text, quote_author)
-            except Exception as e:
-                continue  # Try next API
-        
-        # If all APIs fail, use local quotes
-        return random.choice(quotes)
+        """Get a quote from the prefetched online pool, or the local list when it is empty"""
+        quote = self.quote_pool.pop() if self.quote_pool else None
+        if quote is not None:
+            return quote
+        return random.choice(LOCAL_QUOTES)
     
+    def get_image_dimensions(self, image_path):
+        """Get (width, height) from the header, cached in the catalog by path, size and mtime.
+
+        Falls back to ImageMagick identify only for formats read_image_size
+        cannot parse.
+        """
+        st = os.stat(image_path)
+        key = (str(image_path), st.st_size, st.st_mtime_ns)
+        dimensions = self.catalog.get_dimensions(*key)
+        if dimensions is None:
+            dimensions = read_image_size(image_path)
+            if dimensions is None:
+                result = subprocess.run(
+                    ['identify', '-format', '%wx%h', f'{image_path}[0]'],
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+                )
+                if result.returncode != 0:
+                    return None
+                dimensions = tuple(map(int, result.stdout.strip().split('x')))
+            self.catalog.set_dimensions(*key, *dimensions)
+        return dimensions
+
+    def truncate_quote(self, full_quote):
+        """Smart truncation - only truncate if really necessary"""
+        if len(full_quote) > 250:  # Much more generous limit
+            # Find a good breaking point (end of sentence or comma)
+            truncate_pos = 200
+            while truncate_pos > 150 and full_quote[truncate_pos] not in '.!?,':
+                truncate_pos -= 1
+            if truncate_pos <= 150:  # If no good break point, use word boundary
+                words = full_quote.split()
+                truncated_words = []
+                char_count = 0
+                for word in words:
+                    if char_count + len(word) + 1 > 200:
+                        break
+                    truncated_words.append(word)
+                    char_count += len(word) + 1
+                full_quote = ' '.join(truncated_words) + '...'
+            else:
+                full_quote = full_quote[:truncate_pos + 1] + '...'
+        return full_quote
+
+    def image_problem(self, image_path, width, height):
+        """Why an image of width x height is unusable, or None if it is fine"""
+        dimensions = f"{width}x{height}"
+
+        # Skip very small images (likely thumbnails) or very thin images
+        if width < 800 or height < 600:
+            return f"small image: {dimensions}"
+
+        # Skip images with extreme aspect ratios that would stretch badly
+        aspect_ratio = width / height
+        if aspect_ratio < 0.7 or aspect_ratio > 3.0:
+            return f"extreme aspect ratio: {dimensions} (ratio: {aspect_ratio:.2f})"
+        return None
+
     def validate_image_dimensions(self, image_path):
         """Validate image has reasonable dimensions to prevent stretching"""
         try:
-            result = subprocess.run(
-                ['identify', '-format', '%wx%h', image_path],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            if result.returncode == 0:
-                dimensions = result.stdout.strip()
-                width, height = map(int, dimensions.split('x'))
-                
-                # Skip very small images (likely thumbnails) or very thin images
-                if width < 800 or height < 600:
-                    print(f"Skipping small image {os.path.basename(image_path)}: {dimensions}")
-                    return False
-                
-                # Skip images with extreme aspect ratios that would stretch badly
-                aspect_ratio = width / height
-                if aspect_ratio < 0.7 or aspect_ratio > 3.0:
-                    print(f"Skipping image with extreme aspect ratio {os.path.basename(image_path)}: {dimensions} (ratio: {aspect_ratio:.2f})")
+            size = self.get_image_dimensions(image_path)
+            if size:
+                problem = self.image_problem(image_path, *size)
+                # Never start a decode that cannot fit the render memory budget; checked
+                # here rather than at ingestion because it depends on settings, not the file
+                if problem is None and not self.fits_memory_budget(image_path, *size, self.budget_actions):
+                    problem = f"over the render memory budget: {size[0]}x{size[1]}"
+                if problem:
+                    print(f"Skipping {os.path.basename(image_path)}: {problem}")
                     return False
-                    
                 return True
             return False
         except Exception as e:
             print(f"Could not validate {os.path.basename(image_path)}: {e}")
             return False
 
-    def create_combined_wallpaper(self, wallpapers):
-        """Create a single image spanning all three monitors with quote"""
+    def tile_key(self, image_path, mtime_ns, size, width, height):
+        return DiskLRUCache.make_key(os.path.abspath(image_path), mtime_ns, size,
+                                     width, height, self.tile_background, self.resize_filter)
+
+    def ingest_image(self, path, size, mtime_ns):
+        """Check, measure, hash and (for new downloads) pre-render one file from a single read.
+
+        Only problems with the file itself are recorded as 'invalid'; returns
+        False, leaving the file pending, when it may still be being written or
+        something else (disk, missing convert) got in the way.
+        """
+        name = os.path.basename(path)
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if time.time() - st.st_mtime < CollectionWatcher.SETTLE_SECONDS:
+                    return False  # Possibly still downloading
+                data = f.read()
+        except OSError as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"WARNING: Could not read {name} for ingestion: {e}")
+            return False
+        digest = hashlib.sha256(data).hexdigest()
+        dimensions = read_image_size_from(io.BytesIO(data))
+        if dimensions is None and Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as img:
+                    dimensions = img.size
+            except Exception:
+                pass
+        if dimensions is None:
+            problem = "unrecognised image format"
+        else:
+            problem = self.image_problem(path, *dimensions)
+        # Only files that arrived while running get tiles; pre-rendering a
+        # whole existing collection would just churn the tile cache
+        if problem is None and st.st_mtime >= self.ingest_started:
+            try:
+                problem = self.prerender_tiles(path, data, st)
+            except OSError as e:
+                print(f"WARNING: Could not pre-render tiles for {name}, will retry: {e}")
+                return False
+        width, height = dimensions or (None, None)
+        dhash = difference_hash(data) if problem is None else None
+        self.catalog.record_ingest(path, st.st_size, st.st_mtime_ns, 'invalid' if problem else 'ok',
+                                   width, height, digest, problem, dhash)
+        if problem:
+            print(f"Ingest: rejected {name}: {problem}")
+        return True
+
+    def prerender_tiles(self, path, data, st):
+        """Render tiles for every current monitor geometry.
+
+        Returns a problem string if the image cannot be decoded, or None;
+        raises OSError for failures that are not the file's fault.
+        """
+        height = int(self.monitors[0]['resolution'].split('x')[1]) if self.monitors else 0
+        for width in sorted({int(m['resolution'].split('x')[0]) for m in self.monitors[:3]}):
+            key = self.tile_key(path, st.st_mtime_ns, st.st_size, width, height)
+            if self.tile_cache.get(key, '.png') is not None:
+                continue
+            temp_tile = self.tile_cache.temp_path_for(key, '.png')
+            try:
+                if self.render_engine == 'pillow':
+                    # Decoded from the bytes already in memory, not read again
+                    render_tile_pillow(io.BytesIO(data), width, height, self.tile_background,
+                                       self.resize_filter, temp_tile)
+                elif not render_tile_imagemagick(path, width, height, self.tile_background,
+                                                 self.resize_filter, temp_tile):
+                    # Cannot tell a bad file from resource limits or a broken install
+                    raise OSError("ImageMagick tile render failed")
+            except Exception as e:
+                if temp_tile.exists():
+                    temp_tile.unlink()
+                # Pillow's decode errors carry no errno; ENOSPC, EACCES or a
+                # missing convert binary do, and are worth another try later
+                if isinstance(e, OSError) and (e.errno is not None or self.render_engine != 'pillow'):
+                    raise
+                return f"could not be decoded: {e}"
+            self.tile_cache.add(key, '.png', temp_tile)
+        return None
+
+    def fits_memory_budget(self, image_path, width, height, actions=None):
+        """Can a source of width x height be decoded within the memory budget,
+        at full size or with JPEG shrink-on-load?
+
+        Decided from header dimensions only, before any decoding. The budget
+        is shared by the tiles decoded in parallel. A render passes its own
+        actions ({'reduced': n, 'skipped': n}) so its decisions are logged and
+        counted in its timing record.
+        """
+        # Pillow holds RGB(X) at 8 bits per channel, ImageMagick (Q16) RGBA at 16
+        bytes_per_pixel = 4 if self.render_engine == 'pillow' else 8
+        budget = self.source_memory_budget()
+        needed = width * height * bytes_per_pixel
+        if needed <= budget:
+            return True
+        name = os.path.basename(str(image_path))
+        if str(image_path).lower().endswith(('.jpg', '.jpeg')) and self.monitors:
+            # libjpeg decodes at 1/2, 1/4 or 1/8 scale, but never below what
+            # the largest monitor needs (see DECODE_HEADROOM)
+            target_width = max(int(m['resolution'].split('x')[0]) for m in self.monitors) * DECODE_HEADROOM
+            target_height = max(int(m['resolution'].split('x')[1]) for m in self.monitors) * DECODE_HEADROOM
+            denominator = 1
+            while (denominator < 8 and -(-width // (denominator * 2)) >= target_width
+                   and -(-height // (denominator * 2)) >= target_height):
+                denominator *= 2
+            reduced = -(-width // denominator) * -(-height // denominator) * bytes_per_pixel
+            if denominator > 1 and reduced <= budget:
+                if actions is not None:
+                    print(f"Memory budget: decoding {name} ({width}x{height}) at 1/{denominator} scale, "
+                          f"{reduced / 2**20:.0f} MB instead of {needed / 2**20:.0f} MB")
+                    actions['reduced'] += 1
+                return True
+        if actions is not None:
+            print(f"Memory budget: skipping {name} ({width}x{height}), decoding needs "
+                  f"{needed / 2**20:.0f} MB of the {budget / 2**20:.0f} MB available per source")
+            actions['skipped'] += 1
+        return False
+
+    def source_memory_budget(self):
+        """Bytes one source decode may use: the render budget split across parallel tiles"""
+        return self.render_memory_mb * 2**20 // max(1, min(self.render_workers, 3))
+
+    def apply_imagemagick_limits(self):
+        """Resource policy for every convert/identify this process starts.
+
+        Pixel caches beyond the memory limit spill to disk up to the disk
+        limit, and a render that needs more than that fails instead of
+        pushing the desktop into swap. Limits already set in the environment
+        are kept.
+        """
+        memory_mb = self.source_memory_budget() // 2**20
+        limits = {
+            'MAGICK_MEMORY_LIMIT': f'{memory_mb}MiB',
+            'MAGICK_MAP_LIMIT': f'{memory_mb * 2}MiB',
+            'MAGICK_DISK_LIMIT': f'{self.render_disk_mb}MiB',
+        }
+        for name, value in limits.items():
+            os.environ.setdefault(name, value)
+
+    def render_tiles(self, wallpapers, widths, height, engine):
+        """Letterbox each wallpaper to its monitor width, in parallel on a cache miss.
+
+        Returns tile paths for the ImageMagick engine and RGB images for the
+        Pillow engine, or None if a tile could not be rendered. New tiles are
+        rendered into the scratch directory and queued for persist_tiles(). Each
+        ImageMagick tile is its own convert process; Pillow releases the GIL
+        while decoding and resampling, so worker threads run tiles on
+        separate cores in both engines.
+        """
+        tiles = [None] * len(wallpapers)
+        jobs = []
+        for index, (image_path, width) in enumerate(zip(wallpapers, widths)):
+            try:
+                st = os.stat(image_path)
+            except OSError as e:
+                print(f"ERROR: Cannot read {os.path.basename(str(image_path))}: {e}")
+                return None
+            key = self.tile_key(image_path, st.st_mtime_ns, st.st_size, width, height)
+            cached = self.tile_cache.get(key, '.png')
+            if cached is None:
+                jobs.append((index, key, image_path, width))
+            elif engine == 'pillow':
+                with Image.open(cached) as tile:
+                    tiles[index] = tile.convert('RGB')
+            else:
+                tiles[index] = cached
+
+        render = render_tile_pillow if engine == 'pillow' else render_tile_imagemagick
+
+        def render_job(job):
+            index, key, image_path, width = job
+            if engine == 'pillow':
+                # Kept in memory; persist_tiles() encodes the PNG later
+                return index, key, render_tile_pillow(image_path, width, height, self.tile_background,
+                                                      self.resize_filter)
+            scratch_tile = self.scratch_dir / f'tile-{key}-{threading.get_ident()}.png'
+            if not render_tile_imagemagick(image_path, width, height, self.tile_background,
+                                           self.resize_filter, scratch_tile):
+                if scratch_tile.exists():
+                    scratch_tile.unlink()
+                return index, key, None
+            return index, key, scratch_tile
+
+        if len(jobs) > 1 and self.render_workers > 1:
+            if self.tile_pool is None:
+                self.tile_pool = ThreadPoolExecutor(max_workers=self.render_workers, thread_name_prefix='tile')
+            results = list(self.tile_pool.map(render_job, jobs))
+        else:
+            results = [render_job(job) for job in jobs]
+        for index, key, tile in results:
+            if tile is not None:
+                tiles[index] = tile
+                self.pending_tiles.append((key, tile))
+        if any(tile is None for tile in tiles):
+            return None
+        return tiles
+
+    def persist_tiles(self):
+        """Hand the tiles rendered by this cycle to the background tile writer"""
+        pending, self.pending_tiles = self.pending_tiles, []
+        if not pending:
+            return
+        if self.tile_writer is None:
+            self.tile_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tile-store')
+        self.tile_writer.submit(self._store_tiles, pending)
+
+    def _store_tiles(self, pending):
+        for key, tile in pending:
+            temp_tile = self.tile_cache.temp_path_for(key, '.png')
+            try:
+                if isinstance(tile, Path):
+                    shutil.move(tile, temp_tile)  # Out of the scratch directory
+                else:
+                    tile.save(temp_tile, 'PNG', compress_level=1)
+                self.tile_cache.add(key, '.png', temp_tile)
+            except Exception as e:
+                print(f"WARNING: Could not store tile in the cache: {e}")
+                for path in (temp_tile, tile):
+                    if isinstance(path, Path) and path.exists():
+                        path.unlink()
+
+    def get_pillow_font(self):
+        """Resolve the quote font to a TrueType file once, via fontconfig"""
+        if self.pillow_font is None:
+            font_file = None
+            try:
+                result = subprocess.run(['fc-match', '-f', '%{file}', self.quote_font],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
+                if result.returncode == 0 and result.stdout.strip():
+                    font_file = result.stdout.strip()
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            try:
+                self.pillow_font = ImageFont.truetype(font_file or 'DejaVuSans-Bold.ttf', self.quote_pointsize)
+            except OSError:
+                print(f"WARNING: Could not load font {self.quote_font}, using Pillow's default font")
+                self.pillow_font = ImageFont.load_default()
+        return self.pillow_font
+
+    def wrap_caption(self, text, font, max_width):
+        """Word-wrap text to max_width pixels, keeping explicit line breaks (like caption:)"""
+        lines = []
+        for paragraph in text.split('\n'):
+            line = ''
+            for word in paragraph.split():
+                candidate = f'{line} {word}' if line else word
+                if line and font.getlength(candidate) > max_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def render_quote_overlay_pillow(self, caption):
+        """Draw the rounded, translucent quote box with its text as an RGBA image"""
+        font = self.get_pillow_font()
+        text = self.wrap_caption(caption, font, self.quote_width)
+        measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        left, top, right, bottom = measure.multiline_textbbox((0, 0), text, font=font, align='center')
+        # caption: output is always -size wide, so the box width is fixed like the ImageMagick engine
+        box_width = self.quote_width + self.quote_padding * 2
+        box_height = (bottom - top) + self.quote_padding * 2
+        overlay = Image.new('RGBA', (box_width, box_height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        draw.rounded_rectangle([0, 0, box_width - 1, box_height - 1], radius=25, fill=(0, 0, 0, 153))
+        text_x = (box_width - (right - left)) // 2 - left
+        draw.multiline_text((text_x, self.quote_padding - top), text, font=font,
+                            fill=(255, 255, 255, 255), align='center')
+        return overlay
+
+    def render_quote_overlay_imagemagick(self, caption, output):
+        """Render the quote box to output with convert; returns (box_width, box_height) or None"""
+        padding = self.quote_padding
+        text_temp_file = self.scratch_dir / 'text-temp.png'
+        
+        # First, create just the text to see how much space it needs
+        text_cmd = [
+            'convert',
+            '-background', 'none',
+            '-fill', 'white',
+            '-font', self.quote_font,
+            '-pointsize', str(self.quote_pointsize),
+            '-size', f'{self.quote_width}x',  # Auto height
+            '-gravity', 'center',
+            f'caption:{caption}',
+            str(text_temp_file)
+        ]
+        subprocess.run(text_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        
+        # Get the dimensions of the created text from its PNG header
+        try:
+            text_w, text_h = read_image_size(text_temp_file)
+            
+            # Calculate box dimensions with padding
+            box_width = text_w + (padding * 2)
+            box_height = text_h + (padding * 2)
+        except (OSError, TypeError):
+            # Fallback dimensions
+            box_width = self.quote_width + 100
+            box_height = 120
+        
+        # Now create the final overlay with proper background
+        overlay_cmd = [
+            'convert',
+            '-size', f'{box_width}x{box_height}',
+            'xc:none',
+            # Draw rounded rectangle background
+            '-fill', 'rgba(0,0,0,0.6)',
+            '-draw', f'roundrectangle 0,0 {box_width-1},{box_height-1} 25,25',
+            # Composite the text on top
+            str(text_temp_file),
+            '-gravity', 'center',
+            '-composite',
+            str(output)
+        ]
+        result = subprocess.run(overlay_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if text_temp_file.exists():
+            text_temp_file.unlink()
+        if result.returncode != 0:
+            return None
+        return box_width, box_height
+
+    def get_quote_overlay(self, caption, engine):
+        """Return (overlay, box_width, box_height), rendering the quote box only on a cache miss.
+
+        overlay is an RGBA image for the Pillow engine and a PNG path for the
+        ImageMagick engine. Entries are keyed by everything that affects the
+        rendering and kept in a small in-memory LRU backed by a disk LRU.
+        """
+        key = DiskLRUCache.make_key(caption, self.quote_font, self.quote_pointsize,
+                                    self.quote_width, self.quote_padding, engine)
+        entry = self.overlay_memory.get(key)
+        if entry is not None and (engine == 'pillow' or os.path.exists(entry[0])):
+            self.overlay_memory.move_to_end(key)
+            return entry
+
+        path = self.overlay_cache.get(key, '.png')
+        if path is not None:
+            if engine == 'pillow':
+                with Image.open(path) as cached:
+                    overlay = cached.convert('RGBA')
+                entry = (overlay, overlay.width, overlay.height)
+            else:
+                entry = (path, *read_image_size(path))
+        else:
+            temp_overlay = self.overlay_cache.temp_path_for(key, '.png')
+            if engine == 'pillow':
+                overlay = self.render_quote_overlay_pillow(caption)
+                overlay.save(temp_overlay, 'PNG', compress_level=1)
+                self.overlay_cache.add(key, '.png', temp_overlay)
+                entry = (overlay, overlay.width, overlay.height)
+            else:
+                size = self.render_quote_overlay_imagemagick(caption, temp_overlay)
+                if size is None:
+                    if temp_overlay.exists():
+                        temp_overlay.unlink()
+                    return None
+                entry = (self.overlay_cache.add(key, '.png', temp_overlay), *size)
+
+        self.overlay_memory[key] = entry
+        while len(self.overlay_memory) > self.overlay_memory_entries:
+            self.overlay_memory.popitem(last=False)
+        return entry
+
+    def create_combined_wallpaper_pillow(self, wallpapers, widths, height, output_path):
+        """Decode, letterbox, append, overlay and encode in memory with a single write"""
+        with self.timer.span('tile_render'):
+            tiles = self.render_tiles(wallpapers, widths, height, 'pillow')
+        with self.timer.span('quote'):
+            quote_text, quote_author = self.get_quote()
+        caption = self.truncate_quote(f'"{quote_text}"\n\n— {quote_author}')
+        with self.timer.span('overlay'):
+            overlay, _box_width, _box_height = self.get_quote_overlay(caption, 'pillow')
+
+        with self.timer.span('composite'):
+            canvas = Image.new('RGB', (sum(widths), height), self.tile_background)
+            x = 0
+            for tile in tiles:
+                canvas.paste(tile, (x, 0))
+                x += tile.width
+            # Bottom-right corner of the rightmost monitor, 50px from the edges
+            position = (canvas.width - overlay.width - 50, height - overlay.height - 50)
+            canvas.paste(overlay, position, overlay)
+
+        # A freshly created canvas carries no EXIF/ICC/XMP, so nothing to strip
+        started = time.perf_counter()
+        with self.timer.span('encode'):
+            image_format, options = OUTPUT_PROFILES[self.output_profile]['pillow']
+            encoded = io.BytesIO()
+            canvas.save(encoded, image_format, **options)
+            data = encoded.getvalue()
+        print(f"Encoded {self.output_profile} in {(time.perf_counter() - started) * 1000:.0f} ms: {len(data) // 1024} KiB")
+        staged = staging_path(output_path)
+        staged.write_bytes(data)
+        os.replace(staged, output_path)
+        return RenderResult.from_bytes(output_path, data, canvas.width, canvas.height, wallpapers)
+
+    def imagemagick_output_args(self, path):
+        """Trailing convert arguments that encode to path with the output profile, without metadata"""
+        image_format, options = OUTPUT_PROFILES[self.output_profile]['imagemagick']
+        return options + ['-strip', f'{image_format}:{path}']
+
+    def render_fused_imagemagick(self, tiles, caption, output_args):
+        """Append the tiles and add the rounded quote box in a single convert.
+
+        The caption is rendered and padded in-graph (kept as mpr:quote), so its
+        size sets the box size without a separate measuring step. The box is a
+        60% black rectangle whose corners are cut with a quarter-circle mask,
+        mirrored with -flip/-flop.
+        """
+        radius = 25
+        cmd = ['convert'] + [str(tile) for tile in tiles] + [
+            '+append',
+            # Caption with its padding: the size of the finished box
+            '(', '-background', 'none', '-fill', 'white', '-font', self.quote_font,
+            '-pointsize', str(self.quote_pointsize), '-size', f'{self.quote_width}x',
+            '-gravity', 'center', f'caption:{caption}',
+            '-bordercolor', 'none', '-border', str(self.quote_padding),
+            '-write', 'mpr:quote', '+delete', ')',
+            # Translucent rounded box, with the caption drawn on top of it
+            '(', 'mpr:quote', '-alpha', 'off', '-fill', 'black', '-colorize', '100',
+            '(', '+clone', '-fill', 'white', '-colorize', '100', '-gravity', 'NorthWest',
+            '-fill', 'black', '-draw', f'polygon 0,0 0,{radius} {radius},0',
+            '-fill', 'white', '-draw', f'circle {radius},{radius} {radius},0',
+            '(', '+clone', '-flip', ')', '-compose', 'Multiply', '-composite',
+            '(', '+clone', '-flop', ')', '-compose', 'Multiply', '-composite', ')',
+            '-alpha', 'off', '-compose', 'CopyOpacity', '-composite',
+            '-channel', 'A', '-evaluate', 'multiply', '0.6', '+channel',
+            'mpr:quote', '-gravity', 'center', '-compose', 'Over', '-composite', ')',
+            # Bottom-right corner of the rightmost monitor, 50px from the edges
+            '-gravity', 'SouthEast', '-geometry', '+50+50', '-compose', 'Over', '-composite',
+            *output_args,
+        ]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            print(f"ERROR: Could not run convert: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"ERROR: Fused ImageMagick render failed: {result.stderr.strip()}")
+            return False
+        return True
+
+    def create_combined_wallpaper(self, wallpapers, output_path=None):
+        """Create a single image spanning all three monitors with quote; returns a RenderResult or None"""
         if len(wallpapers) < 3 or len(self.monitors) < 3:
             return None
         
         # Pre-validate individual images to prevent stretching issues
-        valid_wallpapers = []
-        for wp in wallpapers:
-            if self.validate_image_dimensions(wp):
-                valid_wallpapers.append(wp)
-            else:
-                print(f"Replacing invalid wallpaper: {os.path.basename(wp)}")
+        with self.timer.span('validate'):
+            valid_wallpapers = []
+            for wp in wallpapers:
+                if self.validate_image_dimensions(wp):
+                    valid_wallpapers.append(wp)
+                else:
+                    print(f"Replacing invalid wallpaper: {os.path.basename(wp)}")
         
         # If we don't have enough valid wallpapers, get replacements
         if len(valid_wallpapers) < 3:
             print("Need replacement wallpapers due to validation failures")
             all_wallpapers = self.get_random_wallpapers(15)  # Get more options
-            for wp in all_wallpapers:
-                if wp not in wallpapers and self.validate_image_dimensions(wp):
-                    valid_wallpapers.append(wp)
-                    if len(valid_wallpapers) >= 3:
-                        break
+            with self.timer.span('validate'):
+                for wp in all_wallpapers:
+                    if wp not in wallpapers and self.validate_image_dimensions(wp):
+                        valid_wallpapers.append(wp)
+                        if len(valid_wallpapers) >= 3:
+                            break
         
         # If still not enough valid wallpapers, skip this cycle
         if len(valid_wallpapers) < 3:
@@ -354,8 +2836,14 @@ class MultiMonitorWallpaper:
             
         wallpapers = valid_wallpapers[:3]  # Use the validated wallpapers
             
-        output_path = Path.home() / '.cache' / 'multi-monitor-wallpaper.jpg'
-        temp_path = Path.home() / '.cache' / 'temp-wallpaper.jpg'
+        if output_path is None:
+            output_path = self.next_output_path()
+        # The appended canvas is an uncompressed MIFF in the scratch directory
+        # (tmpfs when available); only the finished wallpaper reaches ~/.cache,
+        # staged beside it and renamed into place
+        temp_path = self.scratch_dir / 'temp-wallpaper.miff'
+        staged = staging_path(output_path)
+        output_args = self.imagemagick_output_args(staged)
         
         # Get dimensions for each monitor
         monitor1_width = int(self.monitors[0]['resolution'].split('x')[0])
@@ -364,49 +2852,44 @@ class MultiMonitorWallpaper:
         height = int(self.monitors[0]['resolution'].split('x')[1])
         total_width = monitor1_width + monitor2_width + monitor3_width
         
-        # Build ImageMagick command to combine images
-        # Each image preserves aspect ratio with black borders as needed
-        cmd = [
-            'convert',
-            # First image for left monitor (preserve aspect ratio)
-            '(',
-            wallpapers[0],
-            '-resize', f'{monitor1_width}x{height}',  # Preserve aspect ratio
-            '-background', 'black',                   # Black background
-            '-gravity', 'center',                     # Center the image
-            '-extent', f'{monitor1_width}x{height}',  # Add borders to exact size
-            ')',
-            # Second image for middle monitor (preserve aspect ratio)
-            '(',
-            wallpapers[1],
-            '-resize', f'{monitor2_width}x{height}',  # Preserve aspect ratio
-            '-background', 'black',                   # Black background
-            '-gravity', 'center',                     # Center the image
-            '-extent', f'{monitor2_width}x{height}',  # Add borders to exact size
-            ')',
-            # Third image for right monitor (preserve aspect ratio)
-            '(',
-            wallpapers[2],
-            '-resize', f'{monitor3_width}x{height}',  # Preserve aspect ratio
-            '-background', 'black',                   # Black background
-            '-gravity', 'center',                     # Center the image
-            '-extent', f'{monitor3_width}x{height}',  # Add borders to exact size
-            ')',
-            # Combine all three side by side
-            '+append',
-            str(temp_path)
-        ]
+        if self.render_engine == 'pillow':
+            try:
+                return self.create_combined_wallpaper_pillow(
+                    wallpapers, (monitor1_width, monitor2_width, monitor3_width), height, output_path)
+            except Exception as e:
+                print(f"WARNING: Pillow render failed ({e}), falling back to ImageMagick")
+        
+        # Letterbox each image to its monitor (served from the tile cache when
+        # possible), then just append the pre-sized tiles side by side
+        with self.timer.span('tile_render'):
+            tiles = self.render_tiles(wallpapers, (monitor1_width, monitor2_width, monitor3_width),
+                                      height, 'imagemagick')
+        if tiles is None:
+            return None
+        cmd = ['convert'] + [str(tile) for tile in tiles] + ['+append', str(temp_path)]
         
         try:
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            # Get a quote
+            with self.timer.span('quote'):
+                quote_text, quote_author = self.get_quote()
+            full_quote = f'"{quote_text}"\n\n— {quote_author}'
+
+            if self.fused_imagemagick:
+                # Whole wallpaper in one convert with a single encode, so
+                # the span cannot be split into composite and encode
+                with self.timer.span('composite_encode'):
+                    fused = self.render_fused_imagemagick(tiles, self.truncate_quote(full_quote), output_args)
+                if fused and staged.exists():
+                    os.replace(staged, output_path)
+                    return RenderResult.from_file(output_path, wallpapers)
+                print("WARNING: Fused ImageMagick render failed, falling back to step-by-step")
+
+            with self.timer.span('composite'):
+                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             if result.returncode != 0:
                 print(f"ERROR: ImageMagick combine failed: {result.stderr}")
                 return None
             
-            # Get a quote
-            quote_text, quote_author = self.get_quote()
-            full_quote = f'"{quote_text}"\n\n— {quote_author}'
-            
             # Add quote to the bottom right using ImageMagick
             # Position on right monitor, bottom right corner
             quote_cmd = [
@@ -418,174 +2901,84 @@ class MultiMonitorWallpaper:
                 '-pointsize', '30',
                 '-annotate', '+50+50',
                 full_quote,
-                str(output_path)
+                *output_args
             ]
             
             # Try with shadow/background for better readability
-            # Create a text overlay that fits properly on the right monitor
-            overlay_width = 800  # Wider to accommodate more text
-            
-            # Smart truncation - only truncate if really necessary
-            if len(full_quote) > 250:  # Much more generous limit
-                # Find a good breaking point (end of sentence or comma)
-                truncate_pos = 200
-                while truncate_pos > 150 and full_quote[truncate_pos] not in '.!?,':
-                    truncate_pos -= 1
-                if truncate_pos <= 150:  # If no good break point, use word boundary
-                    words = full_quote.split()
-                    truncated_words = []
-                    char_count = 0
-                    for word in words:
-                        if char_count + len(word) + 1 > 200:
-                            break
-                        truncated_words.append(word)
-                        char_count += len(word) + 1
-                    full_quote = ' '.join(truncated_words) + '...'
-                else:
-                    full_quote = full_quote[:truncate_pos + 1] + '...'
-            
-            # Create text first to get its dimensions, then create properly sized background
-            text_width = overlay_width
-            padding = 40
-            
-            # First, create just the text to see how much space it needs
-            text_cmd = [
-                'convert',
-                '-background', 'none',
-                '-fill', 'white',
-                '-font', 'Ubuntu-Bold',
-                '-pointsize', '24',
-                '-size', f'{text_width}x',  # Auto height
-                '-gravity', 'center',
-                f'caption:{full_quote}',
-                str(Path.home() / '.cache' / 'text-temp.png')
-            ]
-            
-            # Create the text image
-            subprocess.run(text_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            # Get the dimensions of the created text
-            try:
-                result = subprocess.run(
-                    ['identify', '-format', '%wx%h', str(Path.home() / '.cache' / 'text-temp.png')],
-                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-                )
-                if result.returncode == 0:
-                    text_dimensions = result.stdout.strip()
-                    text_w, text_h = map(int, text_dimensions.split('x'))
-                    
-                    # Calculate box dimensions with padding
-                    box_width = text_w + (padding * 2)
-                    box_height = text_h + (padding * 2)
-                else:
-                    # Fallback dimensions
-                    box_width = overlay_width + 100
-                    box_height = 120
-            except:
-                # Fallback dimensions
-                box_width = overlay_width + 100
-                box_height = 120
-            
-            # Now create the final overlay with proper background
-            overlay_cmd = [
-                'convert',
-                '-size', f'{box_width}x{box_height}',
-                'xc:none',
-                # Draw rounded rectangle background
-                '-fill', 'rgba(0,0,0,0.6)',
-                '-draw', f'roundrectangle 0,0 {box_width-1},{box_height-1} 25,25',
-                # Composite the text on top
-                str(Path.home() / '.cache' / 'text-temp.png'),
-                '-gravity', 'center',
-                '-composite',
-                str(Path.home() / '.cache' / 'quote-overlay.png')
-            ]
+            full_quote = self.truncate_quote(full_quote)
             
-            # Create the text overlay first
-            subprocess.run(overlay_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # The rounded quote box is rendered once per quote and then cached
+            with self.timer.span('overlay'):
+                overlay = self.get_quote_overlay(full_quote, 'imagemagick')
             
-            # Now composite the overlay onto the wallpaper
-            # Position it on the rightmost monitor (third monitor), bottom-right corner
-            overlay_x = monitor1_width + monitor2_width + monitor3_width - box_width - 50
-            overlay_y = height - box_height - 50  # Position from top
-            
-            quote_cmd_with_shadow = [
-                'convert',
-                str(temp_path),
-                str(Path.home() / '.cache' / 'quote-overlay.png'),
-                '-geometry', f'+{overlay_x}+{overlay_y}',
-                '-composite',
-                str(output_path)
-            ]
+            quote_cmd_with_shadow = None
+            if overlay is not None:
+                overlay_path, box_width, box_height = overlay
+                # Now composite the overlay onto the wallpaper
+                # Position it on the rightmost monitor (third monitor), bottom-right corner
+                overlay_x = monitor1_width + monitor2_width + monitor3_width - box_width - 50
+                overlay_y = height - box_height - 50  # Position from top
+                
+                quote_cmd_with_shadow = [
+                    'convert',
+                    str(temp_path),
+                    str(overlay_path),
+                    '-geometry', f'+{overlay_x}+{overlay_y}',
+                    '-composite',
+                    *output_args
+                ]
             
-            try:
-                result = subprocess.run(quote_cmd_with_shadow, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                if result.returncode != 0:
-                    raise subprocess.CalledProcessError(result.returncode, quote_cmd_with_shadow)
-            except subprocess.CalledProcessError:
-                # Fallback to simple text without background
+            # This convert both composites the caption and encodes the output
+            with self.timer.span('composite_encode'):
                 try:
-                    result = subprocess.run(quote_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                    if quote_cmd_with_shadow is None:
+                        raise subprocess.CalledProcessError(1, 'quote overlay')
+                    result = subprocess.run(quote_cmd_with_shadow, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
                     if result.returncode != 0:
-                        print(f"Warning: Quote overlay failed, using plain image")
-                        os.rename(temp_path, output_path)
-                except Exception as e:
-                    print(f"Warning: Could not add quote: {e}")
-                    # If adding quote fails, just use the combined image
-                    if temp_path.exists():
-                        os.rename(temp_path, output_path)
-            
-            # Clean up temp files
-            if temp_path.exists():
-                temp_path.unlink()
+                        raise subprocess.CalledProcessError(result.returncode, quote_cmd_with_shadow)
+                except subprocess.CalledProcessError:
+                    # Fallback to simple text without background
+                    try:
+                        result = subprocess.run(quote_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                        if result.returncode != 0:
+                            print(f"Warning: Quote overlay failed, using plain image")
+                            subprocess.run(['convert', str(temp_path), *output_args],
+                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    except Exception as e:
+                        print(f"Warning: Could not add quote: {e}")
+                        # If adding quote fails, just use the combined image
+                        if temp_path.exists():
+                            subprocess.run(['convert', str(temp_path), *output_args],
+                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
             
-            # Clean up temporary files
-            overlay_file = Path.home() / '.cache' / 'quote-overlay.png'
-            if overlay_file.exists():
-                overlay_file.unlink()
-                
-            text_temp_file = Path.home() / '.cache' / 'text-temp.png'
-            if text_temp_file.exists():
-                text_temp_file.unlink()
-                
-            return output_path
+            if not staged.exists():
+                print("ERROR: ImageMagick did not write the combined wallpaper")
+                return None
+            os.replace(staged, output_path)
+            return RenderResult.from_file(output_path, wallpapers)
         except subprocess.CalledProcessError as e:
             print(f"Error creating combined wallpaper: {e}")
             return None
+        finally:
+            # Clean up temp files
+            for leftover in (temp_path, staged):
+                if leftover.exists():
+                    leftover.unlink()
     
     def set_gnome_wallpaper(self, wallpaper_path):
         """Set wallpaper using GNOME's gsettings and sync to lock screen"""
         if wallpaper_path and os.path.exists(wallpaper_path):
             uri = f"file://{wallpaper_path}"
-            # First set to spanned mode for multi-monitor
-            subprocess.run([
-                'gsettings', 'set',
-                'org.gnome.desktop.background',
-                'picture-options', 'spanned'
-            ])
-            # Then set the wallpaper URI
-            subprocess.run([
-                'gsettings', 'set',
-                'org.gnome.desktop.background',
-                'picture-uri', uri
-            ])
-            subprocess.run([
-                'gsettings', 'set',
-                'org.gnome.desktop.background',
-                'picture-uri-dark', uri
-            ])
-
-            # Sync the same wallpaper to lock screen for artistic office display
-            subprocess.run([
-                'gsettings', 'set',
-                'org.gnome.desktop.screensaver',
-                'picture-uri', uri
-            ])
-            subprocess.run([
-                'gsettings', 'set',
-                'org.gnome.desktop.screensaver',
-                'picture-options', 'spanned'
-            ])
+            # Spanned mode for multi-monitor, the wallpaper URI, and the same
+            # wallpaper on the lock screen for artistic office display, all
+            # written as one batch
+            self.settings_writer.apply({
+                ('org.gnome.desktop.background', 'picture-options'): 'spanned',
+                ('org.gnome.desktop.background', 'picture-uri'): uri,
+                ('org.gnome.desktop.background', 'picture-uri-dark'): uri,
+                ('org.gnome.desktop.screensaver', 'picture-uri'): uri,
+                ('org.gnome.desktop.screensaver', 'picture-options'): 'spanned',
+            })
             print(f"✓ Synced wallpaper to lock screen: {os.path.basename(wallpaper_path)}")
     
     def set_wallpapers_xwallpaper(self, wallpapers):
@@ -606,22 +2999,39 @@ class MultiMonitorWallpaper:
             return True
         return False
     
-    def cycle_wallpapers(self):
-        """Change wallpapers to new random ones with source diversity"""
-        # Add safety check - if we fail 3 times in a row, wait longer
-        max_retries = 3
-        for attempt in range(max_retries):
-            wallpapers = self.get_source_diverse_wallpapers(len(self.monitors))
+    def next_output_path(self):
+        """Path for the next composite: a single file, or alternating buffers when prefetching"""
+        if not self.prefetch:
+            return Path.home() / '.cache' / f"multi-monitor-wallpaper{OUTPUT_PROFILES[self.output_profile]['suffix']}"
+        # Never overwrite the file that is currently on screen
+        if self.current_wallpaper == self.output_buffers[0]:
+            return self.output_buffers[1]
+        return self.output_buffers[0]
 
-            if wallpapers and len(wallpapers) >= 3:
-                break
-            else:
-                print(f"ERROR: Insufficient wallpapers found! Got {len(wallpapers)}, need 3 (attempt {attempt + 1}/{max_retries})")
-                if attempt < max_retries - 1:
-                    time.sleep(5)  # Wait 5 seconds before retry
-                else:
-                    print("CRITICAL: Unable to find wallpapers after multiple attempts. Service will wait 60s.")
-                    return
+    def prepare_wallpaper(self, output_path):
+        """Select, render and verify a composite; returns a RenderResult or None"""
+        started = time.perf_counter()
+        prepared = None
+        budget_actions = {'reduced': 0, 'skipped': 0}
+        try:
+            with self.render_lock:
+                self.budget_actions = budget_actions  # Counted by this render's validation only
+                try:
+                    prepared = self._prepare_wallpaper(output_path)
+                finally:
+                    self.persist_tiles()
+            return prepared
+        finally:
+            self.timer.flush('render', ok=prepared is not None, engine=self.render_engine, profile=self.output_profile,
+                             bytes=prepared.bytes if prepared else None, budget=budget_actions,
+                             total=round(time.perf_counter() - started, 6))
+
+    def _prepare_wallpaper(self, output_path):
+        # No in-cycle retry sleeps: the scheduler simply tries again next tick
+        wallpapers = self.get_source_diverse_wallpapers(len(self.monitors))
+        if not wallpapers or len(wallpapers) < 3:
+            print(f"ERROR: Insufficient wallpapers found! Got {len(wallpapers)}, need 3. Retrying at the next tick.")
+            return None
         
         # Verify the wallpapers are different
         if len(set(wallpapers)) < len(wallpapers):
@@ -629,57 +3039,112 @@ class MultiMonitorWallpaper:
             wallpapers = self.get_random_wallpapers(len(self.monitors))
             if len(set(wallpapers)) < len(wallpapers):
                 print("ERROR: Still got duplicates, check wallpaper directory")
-                return
+                return None
         
         # For GNOME, we need to use the combined wallpaper method
-        print(f"Creating combined wallpaper (5760x1080)...")
-        combined = self.create_combined_wallpaper(wallpapers)
-        
-        if combined and os.path.exists(combined):
-            # Verify the combined image was created with correct dimensions
+        total_width = sum(int(m['resolution'].split('x')[0]) for m in self.monitors[:3])
+        height = self.monitors[0]['resolution'].split('x')[1] if self.monitors else 0
+        print(f"Creating combined wallpaper ({total_width}x{height})...")
+        try:
+            result = self.create_combined_wallpaper(wallpapers, output_path)
+        except OSError as e:
+            print(f"ERROR: Failed to read back the combined wallpaper: {e}")
+            result = None
+        if result is None:
+            print("ERROR: Failed to create combined wallpaper!")
+            return None
+
+        with self.timer.span('verify'):
+            verified = self.verify_render(result)
+        if not verified:
+            print("Skipping this wallpaper cycle to prevent stretching")
+            # Clean up the bad combined image
+            if result.path.exists():
+                result.path.unlink()
+            return None  # Skip this cycle
+        return result
+
+    def verify_render(self, result):
+        """Check a render against the monitor layout using the geometry it
+        reported; identify is only run in paranoid mode or when the header
+        could not be parsed"""
+        expected_width = sum(int(m['resolution'].split('x')[0]) for m in self.monitors[:3])
+        expected_height = int(self.monitors[0]['resolution'].split('x')[1])
+        width, height = result.width, result.height
+        if self.paranoid_verify or width is None:
             try:
-                result = subprocess.run(
-                    ['identify', '-format', '%wx%h', str(combined)],
+                identified = subprocess.run(
+                    ['identify', '-format', '%wx%h', str(result.path)],
                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
                 )
-                if result.returncode == 0:
-                    dimensions = result.stdout.strip()
-                    print(f"Combined wallpaper dimensions: {dimensions}")
-                    
-                    # Check if dimensions match expected multi-monitor setup
-                    expected_width = sum(int(m['resolution'].split('x')[0]) for m in self.monitors[:3])
-                    expected_height = int(self.monitors[0]['resolution'].split('x')[1])
-                    expected_dimensions = f"{expected_width}x{expected_height}"
-                    
-                    if dimensions != expected_dimensions:
-                        print(f"ERROR: Wrong dimensions! Expected {expected_dimensions}, got {dimensions}")
-                        print("Skipping this wallpaper cycle to prevent stretching")
-                        
-                        # Clean up the bad combined image
-                        if os.path.exists(combined):
-                            os.unlink(combined)
-                        return  # Skip this cycle
-                    
-                    # Force GNOME to spanned mode before setting wallpaper
-                    subprocess.run([
-                        'gsettings', 'set',
-                        'org.gnome.desktop.background',
-                        'picture-options', 'spanned'
-                    ])
-                    
-                    self.set_gnome_wallpaper(combined)
-                    print(f"✓ Set combined wallpaper from:")
-                    for i, wallpaper in enumerate(wallpapers[:3]):
-                        monitor_name = self.monitors[i]['name'] if i < len(self.monitors) else f"Monitor {i}"
-                        print(f"  {monitor_name}: {os.path.basename(wallpaper)}")
-                else:
-                    print("ERROR: Could not verify image dimensions")
-                    return
             except Exception as e:
                 print(f"ERROR: Failed to verify image: {e}")
-                return
-        else:
-            print("ERROR: Failed to create combined wallpaper!")
+                return False
+            if identified.returncode != 0:
+                print("ERROR: Could not verify image dimensions")
+                return False
+            width, height = (int(n) for n in identified.stdout.strip().split('x'))
+        print(f"Combined wallpaper dimensions: {width}x{height} "
+              f"({result.bytes // 1024} KiB, sha256 {result.sha256[:12]})")
+        if result.bytes == 0:
+            print("ERROR: Combined wallpaper is empty")
+            return False
+        if (width, height) != (expected_width, expected_height):
+            print(f"ERROR: Wrong dimensions! Expected {expected_width}x{expected_height}, got {width}x{height}")
+            return False
+        return True
+
+    def apply_wallpaper(self, result):
+        """Point GNOME at an already rendered composite"""
+        with self.timer.span('apply'):
+            self.set_gnome_wallpaper(result.path)
+        self.current_wallpaper = result.path
+        print(f"✓ Set combined wallpaper from:")
+        for i, wallpaper in enumerate(result.sources[:3]):
+            monitor_name = self.monitors[i]['name'] if i < len(self.monitors) else f"Monitor {i}"
+            print(f"  {monitor_name}: {os.path.basename(wallpaper)}")
+
+    def update_monitor_layout(self):
+        """Pick up docking/undocking, dropping anything rendered for the old layout"""
+        monitors = self.monitor_watcher.check()
+        if monitors is None:
+            return False
+        print("Monitor layout changed:")
+        for m in monitors:
+            print(f"  {m['name']}: {m['resolution']} at x={m['x_position']}")
+        self.monitors = monitors
+        if self.prefetch_future is not None:
+            # Rendered for the old geometry; tiles are keyed by size so the cache stays valid
+            self.prefetch_future.cancel()
+            self.prefetch_future = None
+        return True
+
+    def cycle_wallpapers(self):
+        """Change wallpapers to new random ones with source diversity"""
+        started = time.perf_counter()
+        self.update_monitor_layout()
+        prepared = None
+        prefetched = self.prefetch_future is not None
+        if self.prefetch_future is not None:
+            try:
+                # Normally finished long ago; only blocks if a render outlasts the interval
+                with self.timer.span('prefetch_wait'):
+                    prepared = self.prefetch_future.result()
+            except Exception as e:
+                print(f"ERROR: Background render failed: {e}")
+            self.prefetch_future = None
+        if prepared is None:
+            prefetched = False
+            prepared = self.prepare_wallpaper(self.next_output_path())
+
+        if prepared:
+            self.apply_wallpaper(prepared)
+        self.timer.flush('cycle', ok=bool(prepared), prefetched=prefetched, lateness=self.tick_lateness,
+                         total=round(time.perf_counter() - started, 6))
+
+        if self.prefetch and self.running:
+            # Render the next cycle while this one is on screen
+            self.prefetch_future = self.prefetch_executor.submit(self.prepare_wallpaper, self.next_output_path())
     
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
@@ -697,11 +3162,60 @@ class MultiMonitorWallpaper:
         for m in self.monitors:
             print(f"  {m['name']}: {m['resolution']} at x={m['x_position']}")
         
+        self.scheduler = DeadlineScheduler(interval)
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.scheduler.trigger())
+        try:
+            PID_FILE.parent.mkdir(parents=True, exist_ok=True)
+            PID_FILE.write_text(str(os.getpid()))
+        except OSError as e:
+            print(f"WARNING: Could not write {PID_FILE}, --next will not work: {e}")
+        
+        try:
+            self._run_loop()
+        finally:
+            remove_pid_file()
+
+    def _run_loop(self):
+        paused = False
+        event = 'tick'
         while self.running:
+            reason = self.idle_policy.should_pause()
+            if reason and event != 'trigger':
+                # Nobody is looking: render nothing until activity returns. The
+                # composite prefetched before pausing is shown first on wake.
+                if not paused:
+                    print(f"Pausing wallpaper rendering ({reason})")
+                    paused = True
+                event = self.scheduler.wait(max_wait=self.idle_check_interval)
+                self.tick_lateness = None  # A resumed cycle is not an on-schedule one
+                continue
+            if paused and not reason:
+                print("Activity detected, resuming wallpaper rendering")
+                paused = False
             self.cycle_wallpapers()
-            time.sleep(interval)
+            if paused:
+                # A --next while still idle: stay paused and keep checking for activity
+                event = self.scheduler.wait(max_wait=self.idle_check_interval)
+                self.tick_lateness = None
+                continue
+            event = self.scheduler.wait()
+            self.tick_lateness = self.scheduler.lateness[-1] if event == 'tick' else None
+            if event == 'tick' and self.tick_lateness > 1:
+                print(f"Wallpaper tick ran {self.tick_lateness:.1f}s late")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cycle source-diverse wallpapers across multiple monitors.')
+    parser.add_argument('--next', action='store_true',
+                        help='ask the running cycler to change the wallpaper now, without shifting its schedule')
+    parser.add_argument('--report-duplicates', action='store_true',
+                        help='list near-identical images in the collection and the space they use, then exit')
+    args = parser.parse_args()
+    if args.next:
+        sys.exit(0 if send_next_command() else 1)
+    if args.report_duplicates:
+        report_duplicates(Path.home() / '.config' / 'variety' / 'Downloaded', env_setting('DUPLICATE_DISTANCE', 6))
+        sys.exit(0)
+    
     # Check for ImageMagick
     try:
         subprocess.run(['convert', '-version'], capture_output=True, check=True)